@@ -1,26 +1,36 @@
-import json
 import os
+import threading
 import time
 from datetime import datetime
 
-import pyperclip
 from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
 
+import ledger
+from browser import (ANSWER_ABORTED, ANSWER_DONE, ANSWER_RUNNING, BROWSER_FAILED, DEADLINE_EXCEEDED, EXTRACT_MODES,
+                     FORM_TIMEOUT, HARVEST_TIMEOUT, IMPLICIT_WAIT, SUBMIT_TIMEOUT, AnswerNotExtracted, ChromeSession,
+                     abort_driver, classify_failure, close_driver, copy_response, driver_alive, open_question_form,
+                     start_chrome, wait_for_answer, wait_for_search_url)
+from corpus import question_id
+from deadlines import HARVEST_MARGIN, QUESTION_TIMEOUT, Deadline, watchdog
+from health import CIRCUIT_OPEN, breaker
+import ratelimit
 from questions import question_format
 
 BASE_URL = "https://deepwiki.com/code-423n4/2025-11-sukukfi"
 
+# a Deep Research answer watched in the submitting tab gets this long before it is left to run_report.py
+INLINE_HARVEST_TIMEOUT = 900
 
-class Deepwiki:
-    def __init__(self, teardown=False):
+report_lock = threading.Lock()
+
+
+class Deepwiki(ChromeSession):
+    def __init__(self, teardown=False, profile_dir=None, launch_profile=None, warm_form=True):
 
-        s = Service(ChromeDriverManager().install())
         self.options = webdriver.ChromeOptions()
 
         # --- Add these two lines here ---
@@ -31,16 +41,21 @@ class Deepwiki:
         # removed headless so the browser window is visible
         # ensure window is visible and starts maximized
         self.options.add_argument('--start-maximized')
+        # concurrent workers each need their own profile so Chrome does not lock it
+        self.profile_dir = profile_dir
+        if profile_dir:
+            self.options.add_argument(f"--user-data-dir={profile_dir}")
         self.teardown = teardown
+        # reset the loaded form in place between questions instead of reloading BASE_URL
+        self.warm_form = warm_form
         # keep chrome open after chromedriver exits
         self.options.add_experimental_option("detach", True)
         self.options.add_experimental_option(
             "excludeSwitches",
             ['enable-logging'])
-        self.driver = webdriver.Chrome(
-            options=self.options,
-            service=s)
-        self.driver.implicitly_wait(50)
+        self.launch_profile = launch_profile
+        self.driver = start_chrome(self.options, launch_profile)
+        self.driver.implicitly_wait(IMPLICIT_WAIT)
         self.collections_url = []
         super(Deepwiki, self).__init__()
 
@@ -50,9 +65,17 @@ class Deepwiki:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.teardown:
-            self.driver.quit()
+            close_driver(self.driver)
+
+    def is_alive(self):
+        """Check that the browser session still answers commands"""
+        return driver_alive(self.driver)
+
+    def toggle_deep_research(self, mode=None):
+        """Switch the form to Deep Research unless `mode` says it is already selected"""
+        if mode == "deep":
+            return
 
-    def toggle_deep_research(self):
         wait = WebDriverWait(self.driver, 20)
 
         xpath = '//button[.//span[normalize-space(text())="Fast"]]'
@@ -63,92 +86,137 @@ class Deepwiki:
         menu_item = wait.until(EC.element_to_be_clickable((By.XPATH, xpath_primary)))
         menu_item.click()
 
-    def ask_question(self, question_gotten, is_reversed=False):
-        wait = WebDriverWait(self.driver, 1200)
+    def submit_question(self, question_gotten, timeout=FORM_TIMEOUT):
+        """Fill the question form in the current tab and press ENTER without waiting for the result page"""
+        textarea, mode = open_question_form(self.driver, BASE_URL, self.warm_form, timeout)
+        self.toggle_deep_research(mode)
+
+        # type the question
+        textarea.click()
+        textarea.clear()
+        formatted_question = question_format(question_gotten)
+
+        # Use JavaScript to set the textarea value directly. It's more reliable for large text.
+        self.driver.execute_script("arguments[0].value = arguments[1];", textarea, formatted_question)
+        # Dispatch an 'input' event to make sure the web application detects the change.
+        self.driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));",
+                                   textarea)
+        textarea.send_keys(".. ")
+
+        textarea.send_keys(Keys.ENTER)
+
+    def ask_question(self, question_gotten, is_reversed=False, harvest=False, harvest_timeout=INLINE_HARVEST_TIMEOUT,
+                     timeout=QUESTION_TIMEOUT):
+        """
+        Submit a question and record its result URL.
+
+        The submission gets `timeout` seconds of wall-clock time; past that the driver is aborted,
+        None is returned and `last_aborted` is set so the caller can queue the question again.
+
+        With harvest=True the tab stays on the result page until the answer is complete, saves the
+        report directly and records the URL as already harvested; an answer that is not finished by
+        `harvest_timeout` is recorded as pending for run_report.py as usual.
+        """
+        # path of the report written by the last inline harvest, None when nothing was saved
+        self.last_report_file = None
+        # True when the last question ran out of its time budget rather than failing outright
+        self.last_aborted = False
+        # class name of whatever made the last submission fail, None after a success
+        self.last_error = None
+        if not breaker.wait(BASE_URL):
+            self.last_error = CIRCUIT_OPEN
+            print("Deepwiki is still failing, not submitting")
+            return None
+        ratelimit.submissions.acquire()
+        started = time.monotonic()
+        deadline = Deadline(timeout)
 
         try:
-            self.driver.get(BASE_URL)
-
-            # # wait for the form containing the textarea
-            form = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'form'))
-            )
-
-            # find the textarea inside the form
-            textarea = form.find_element(By.CSS_SELECTOR, 'textarea')
-            self.toggle_deep_research()
-
-            # type the question
-            textarea.click()
-            textarea.clear()
-            formatted_question = question_format(question_gotten)
-
-            # Use JavaScript to set the textarea value directly. It's more reliable for large text.
-            self.driver.execute_script("arguments[0].value = arguments[1];", textarea, formatted_question)
-            # Dispatch an 'input' event to make sure the web application detects the change.
-            self.driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));",
-                                       textarea)
-            textarea.send_keys(".. ")
-
-            textarea.send_keys(Keys.ENTER)
-
-            time.sleep(10)
-            current_url = self.driver.current_url
+            with watchdog.watch(deadline, lambda: abort_driver(self.driver)):
+                self.submit_question(question_gotten, deadline.remaining())
+                current_url = wait_for_search_url(self.driver, deadline.remaining(SUBMIT_TIMEOUT))
+
+            if not current_url:
+                self.last_error = classify_failure(self.driver, deadline)
+                self.last_aborted = self.last_error == DEADLINE_EXCEEDED
+                if self.last_error == BROWSER_FAILED:
+                    print("The browser stopped responding, not saving this submission")
+                    return None
+                breaker.record_failure()
+                ratelimit.submissions.failure()
+                print(f"Submission was not confirmed, still on {self.driver.current_url}; not saving it")
+                return None
+
+            breaker.record_success()
+            ratelimit.submissions.success(time.monotonic() - started)
+            report_generated = False
+            if harvest:
+                report_generated = self.harvest_answer(current_url, harvest_timeout)
 
             # add the current url to collections
-            self.save_to_collections(question_gotten, current_url, is_reversed)
+            self.save_to_collections(question_gotten, current_url, is_reversed, report_generated)
+            return current_url
         except Exception as a:
+            self.last_error = classify_failure(self.driver, deadline, a)
+            self.last_aborted = self.last_error == DEADLINE_EXCEEDED
+            if self.last_error == BROWSER_FAILED:
+                print("The browser stopped responding, not saving this submission")
+                return None
+            breaker.record_failure()
+            ratelimit.submissions.failure()
             print(f"There was an error in index : {a}")
+            return None
 
             # In your Deepwiki class where you save to collections.json
 
-    def save_to_collections(self, question, url, is_reversed=False):
+    def harvest_answer(self, url, timeout=INLINE_HARVEST_TIMEOUT):
+        """Wait for the answer in the current tab and save it; returns True when the answer was harvested"""
+        deadline = Deadline(timeout + HARVEST_MARGIN)
+        try:
+            with watchdog.watch(deadline, lambda: abort_driver(self.driver)):
+                if wait_for_answer(self.driver, timeout) == ANSWER_RUNNING:
+                    print(f"Answer is still being generated for {url}, leaving it for run_report.py")
+                    return False
+
+                content = copy_response(self.driver, WebDriverWait(self.driver, deadline.remaining(30)), "page")
+            self.last_report_file = save_report(content, url)
+            return True
+        except Exception as e:
+            print(f"Error harvesting {url} inline: {e}")
+            return False
+
+    def save_to_collections(self, question, url, is_reversed=False, report_generated=False):
         """Save question and URL to collections.json"""
         collections_file = "collections.json"
 
         if is_reversed:
             collections_file = "reversed_collections.json"
 
-        # Load existing data or start fresh
-        try:
-            if os.path.exists(collections_file):
-                with open(collections_file, "r") as f:
-                    content = f.read().strip()
-                    data = json.loads(content) if content else []
-            else:
-                data = []
-        except json.JSONDecodeError:
-            print("Invalid collections.json, creating new file")
-            data = []
-
-        # Add new entry
-        data.append({
-            "question": question,
-            "url": url,
-            "timestamp": str(datetime.now()),
-            "report_generated": False
-        })
-
-        # Save with proper formatting
         try:
-            with open(collections_file, "w") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # the full text lives in questions.jsonl; the ledger only needs its id
+            ledger.append_entry(collections_file, {
+                "question_id": question_id(question),
+                "url": url,
+                "timestamp": str(datetime.now()),
+                "report_generated": report_generated
+            })
         except Exception as e:
             print(f"Error saving to collections: {e}")
 
 
-class GetReports:
-    def __init__(self, teardown=False):
+class GetReports(ChromeSession):
+    def __init__(self, teardown=False, extract="page", launch_profile=None):
 
-        s = Service(ChromeDriverManager().install())
+        if extract not in EXTRACT_MODES:
+            raise ValueError(f"Unknown extract mode {extract!r}, expected one of {EXTRACT_MODES}")
+        self.extract = extract
         self.options = webdriver.ChromeOptions()
 
-        # --- Add these two lines here ---
-        # self.options.add_argument("--headless")
-        # self.options.add_argument("--window-size=1920,1080")
-        # ---------------------------------
+        # only the system clipboard mode needs a visible browser
+        if extract != "clipboard":
+            self.options.add_argument("--headless")
+            self.options.add_argument("--window-size=1920,1080")
 
-        # removed headless so the browser window is visible
         # ensure window is visible and starts maximized
         self.options.add_argument('--start-maximized')
         self.teardown = teardown
@@ -157,48 +225,76 @@ class GetReports:
         self.options.add_experimental_option(
             "excludeSwitches",
             ['enable-logging'])
-        self.driver = webdriver.Chrome(
-            options=self.options,
-            service=s)
-        self.driver.implicitly_wait(50)
+        self.launch_profile = launch_profile
+        self.driver = start_chrome(self.options, launch_profile)
+        self.driver.implicitly_wait(IMPLICIT_WAIT)
         self.collections_url = []
+        # status flips are batched for the length of the harvest run
+        self.status = ledger.StatusBatch("collections.json")
         super(GetReports, self).__init__()
 
-    def get_report(self, url):
+    def get_report(self, url, timeout=HARVEST_TIMEOUT):
+        """
+        Harvest one answer within `timeout` seconds of answer wait plus HARVEST_MARGIN.
+
+        Returns ANSWER_DONE, ANSWER_RUNNING, ANSWER_ABORTED when the budget ran out and the
+        driver was cut off (it is restarted on the next call), or None on any other error.
+        """
+        # path of the report written by the last call, None when nothing was saved
+        self.last_report_file = None
+        # class name of whatever made the last harvest fail, None otherwise
+        self.last_error = None
+        if not breaker.wait(BASE_URL):
+            self.last_error = CIRCUIT_OPEN
+            print(f"Deepwiki is still failing, not harvesting {url}")
+            return None
+        if not self.ensure_driver():
+            self.last_error = BROWSER_FAILED
+            return None
+        ratelimit.harvests.acquire()
+        deadline = Deadline(timeout + HARVEST_MARGIN)
 
         try:
-            self.driver.get(url)
-
-            wait = WebDriverWait(self.driver, 120)
-            #  this would click the copy button
-            copy_button_selector = (By.CSS_SELECTOR, '[aria-label="Copy"]')
-            all_copy_buttons = wait.until(
-                EC.presence_of_all_elements_located(copy_button_selector)
-            )
-            last_copy_button = all_copy_buttons[-1]
-            wait.until(EC.element_to_be_clickable(last_copy_button)).click()
-
-            xpath = "//div[@role='menuitem' and normalize-space(text())='Copy response']"
-            el = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
-            el.click()
-
-            clipboard_content = pyperclip.paste()
-
-            # Check if the content exists AND if it does NOT contain the "#NoVulnerability" string
-            if clipboard_content and "#NoVulnerability" not in clipboard_content and "#No" not in clipboard_content:
-                filename = f"audits/audit_{self.get_next_report_number()}.md"
-                with open(filename, "w") as f:
-                    f.write(clipboard_content)
-                print(f"Saved report for question {url} to {filename}")
-            else:
-                # This will now handle both empty clipboard and cases where no vulnerability was found
-                print(f"No vulnerability found or clipboard was empty for: '{url}'")
+            with watchdog.watch(deadline, lambda: abort_driver(self.driver)):
+                started = time.monotonic()
+                self.driver.get(url)
+                load_seconds = time.monotonic() - started
+
+                if wait_for_answer(self.driver, deadline.remaining(timeout)) == ANSWER_RUNNING:
+                    # the site answered, the answer just is not finished
+                    breaker.record_success()
+                    ratelimit.harvests.success(load_seconds)
+                    print(f"Answer is still being generated for {url}, leaving it for later")
+                    return ANSWER_RUNNING
+
+                # the answer is complete, so the copy controls should already be there
+                wait = WebDriverWait(self.driver, deadline.remaining(30))
+                clipboard_content = copy_response(self.driver, wait, self.extract)
+
+            self.last_report_file = save_report(clipboard_content, url)
 
             # Clear textarea for next question
             self.mark_report_generated(url)
-            time.sleep(1)  # give it a moment to clear
+            breaker.record_success()
+            ratelimit.harvests.success(load_seconds)
+            return ANSWER_DONE
         except Exception as e:
+            self.last_error = classify_failure(self.driver, deadline, e)
+            if self.last_error == BROWSER_FAILED:
+                print(f"The browser stopped responding while harvesting {url}")
+                return None
+            if isinstance(e, AnswerNotExtracted):
+                # the site answered; the answer just could not be read, so leave it unharvested for a retry
+                self.last_error = type(e).__name__
+                print(f"Could not read the answer of {url}, leaving it for later: {e}")
+                return None
+            breaker.record_failure()
+            ratelimit.harvests.failure()
+            if self.last_error == DEADLINE_EXCEEDED:
+                print(f"Harvest of {url} ran out of its {deadline.seconds}s budget, leaving it for later")
+                return ANSWER_ABORTED
             print(f"There was an error in index {url}: {e}")
+            return None
 
     def mark_report_generated(self, url):
         """Mark this URL's report as generated in collections.json"""
@@ -206,39 +302,50 @@ class GetReports:
             return
 
         try:
-            with open("collections.json", "r") as f:
-                data = json.load(f)
-
-            # Find and update the item
-            for item in data:
-                if item.get("url") == url:
-                    item["report_generated"] = True
-                    break
-
-            with open("collections.json", "w") as f:
-                json.dump(data, f, indent=2)
+            self.status.mark(url)
         except Exception as e:
             print(f"Error marking report as generated: {e}")
 
     def get_next_report_number(self):
         """Get the next available report number"""
-        if not os.path.exists("audits"):
-            os.makedirs("audits")
-            return 1
+        return next_report_number()
 
-        existing_files = [f for f in os.listdir("audits") if f.startswith("audit_") and f.endswith(".md")]
 
-        if not existing_files:
-            return 1
+def next_report_number():
+    """Get the next available report number"""
+    if not os.path.exists("audits"):
+        os.makedirs("audits")
+        return 1
 
-        # Extract numbers from existing files
-        numbers = []
-        for f in existing_files:
-            try:
-                num = int(f.replace("audit_", "").replace(".md", ""))
-                numbers.append(num)
-            except ValueError:
-                continue
+    existing_files = [f for f in os.listdir("audits") if f.startswith("audit_") and f.endswith(".md")]
 
-        return max(numbers) + 1 if numbers else 1
+    if not existing_files:
+        return 1
 
+    # Extract numbers from existing files
+    numbers = []
+    for f in existing_files:
+        try:
+            num = int(f.replace("audit_", "").replace(".md", ""))
+            numbers.append(num)
+        except ValueError:
+            continue
+
+    return max(numbers) + 1 if numbers else 1
+
+
+def save_report(content, url):
+    """Write a harvested answer to audits/ unless it reports no vulnerability; returns the file written or None"""
+    # Check if the content exists AND if it does NOT contain the "#NoVulnerability" string
+    if content and "#NoVulnerability" not in content and "#No" not in content:
+        # numbering and writing happen together so concurrent harvesters never share a number
+        with report_lock:
+            filename = f"audits/audit_{next_report_number()}.md"
+            with open(filename, "w") as f:
+                f.write(content)
+        print(f"Saved report for question {url} to {filename}")
+        return filename
+
+    # This will now handle both empty clipboard and cases where no vulnerability was found
+    print(f"No vulnerability found or clipboard was empty for: '{url}'")
+    return None
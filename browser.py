@@ -0,0 +1,715 @@
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+# a submitted question lands on a /search/<slug> page once Deepwiki has accepted it
+SEARCH_PATH = "/search/"
+SUBMIT_TIMEOUT = 60
+# short enough that a missing element fails fast instead of holding a worker
+IMPLICIT_WAIT = 10
+# a navigation that has not finished by then raises instead of blocking on Chrome's 300s default
+PAGE_LOAD_TIMEOUT = 90
+
+# an answer counts as finished once its Copy button exists and the text has not changed for ANSWER_SETTLE seconds
+HARVEST_TIMEOUT = 120
+ANSWER_SETTLE = 5
+ANSWER_DONE = "done"
+ANSWER_RUNNING = "running"
+# the harvest ran out of its time budget and was cut off
+ANSWER_ABORTED = "aborted"
+# the error class reported when the local browser could not be started or died on its own; this
+# is never the item's fault, so it is not charged against the item's retry attempts
+BROWSER_FAILED = "BrowserFailed"
+# browser failures in a row after which a batch stops instead of cycling through its items
+BROWSER_FAILURE_LIMIT = 3
+# the error class of an item that was in flight in a tab when its browser died or was aborted for
+# another item; it is put back as it is, and the browser's failure is counted once by its owner
+BROWSER_GONE = "BrowserGone"
+# the error class of an item whose time budget ran out and whose driver was aborted
+DEADLINE_EXCEEDED = "DeadlineExceeded"
+
+# resolved chromedriver location, shared by every driver class in the process and across runs
+CHROMEDRIVER_CACHE = os.environ.get(
+    "CHROMEDRIVER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "skk", "chromedriver.json")
+)
+
+# launch profile for every driver class, picked per call or through SKK_CHROME_PROFILE:
+#   default - the flags the scripts have always used
+#   lean    - eager page loads, no extensions/background networking/GPU, and non-essential requests blocked
+CHROME_PROFILE_ENV = "SKK_CHROME_PROFILE"
+CHROME_PROFILES = ("default", "lean")
+
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-dev-shm-usage",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--no-first-run",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+]
+
+# attach to a long-lived Chrome (see `python browser.py warm`) instead of launching one per driver
+CHROME_ATTACH_ENV = "SKK_CHROME_ATTACH"
+WARM_CHROME_PORT = 9222
+WARM_CHROME_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "skk", "chrome-profile")
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+# requests the question form and answers never need; applied per tab through the DevTools protocol
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico", "*.svg",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*segment.io*", "*segment.com*", "*posthog*", "*hotjar*", "*sentry.io*", "*intercom*",
+]
+
+# how report text is read back after pressing "Copy response":
+#   page      - capture the text the page hands to the clipboard API, falling back to the DOM
+#   dom       - read the rendered answer straight from the DOM
+#   clipboard - read the system clipboard (needs a display and xclip)
+EXTRACT_MODES = ("page", "dom", "clipboard")
+
+# replaces the clipboard APIs inside the page so copied text stays in the tab
+CLIPBOARD_HOOK_JS = """
+window.__copiedText = null;
+const keep = (text) => { window.__copiedText = String(text); return Promise.resolve(); };
+const clipboard = navigator.clipboard || {};
+clipboard.writeText = keep;
+clipboard.write = async (items) => {
+  for (const item of items) {
+    if (item.types.includes('text/plain')) {
+      window.__copiedText = await (await item.getType('text/plain')).text();
+    }
+  }
+};
+if (!navigator.clipboard) {
+  Object.defineProperty(navigator, 'clipboard', {value: clipboard});
+}
+const setData = DataTransfer.prototype.setData;
+DataTransfer.prototype.setData = function (type, value) {
+  if (type === 'text/plain' || type === 'text') { window.__copiedText = String(value); }
+  return setData.call(this, type, value);
+};
+"""
+
+# text of the answer block that owns the last Copy button
+LAST_ANSWER_TEXT_JS = """
+const buttons = document.querySelectorAll('[aria-label="Copy"]');
+if (!buttons.length) { return null; }
+let node = buttons[buttons.length - 1];
+while (node && node !== document.body) {
+  const content = node.querySelector('.prose, [class*="markdown"]');
+  if (content) { return content.innerText; }
+  node = node.parentElement;
+}
+return null;
+"""
+
+# cheap fingerprint of the response area, read without implicit waits
+ANSWER_STATE_JS = """
+const root = document.querySelector('main') || document.body;
+return [
+  document.querySelectorAll('[aria-label="Copy"]').length,
+  root.innerText.length,
+  document.querySelectorAll('[aria-busy="true"]').length
+];
+"""
+
+# a question form that can take a new question, and the label of its mode button
+FORM_STATE_JS = """
+const textarea = document.querySelector('form textarea');
+if (!textarea || textarea.disabled) { return null; }
+const labels = Array.from(document.querySelectorAll('form button span')).map(s => s.textContent.trim());
+return labels.includes('Deep Research') ? 'deep' : labels.includes('Fast') ? 'fast' : 'unknown';
+"""
+
+FORM_TIMEOUT = 60
+FORM_RESET_TIMEOUT = 10
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def chromedriver_path(refresh=False):
+    """
+    Resolve the chromedriver binary once per process.
+
+    Order: CHROMEDRIVER_PATH, the in-process value, the on-disk cache, then ChromeDriverManager.
+    When ChromeDriverManager cannot reach the network the last cached binary or one on PATH is used.
+    """
+    global _chromedriver_path
+
+    with _chromedriver_lock:
+        override = os.environ.get("CHROMEDRIVER_PATH")
+        if override:
+            return override
+
+        if not refresh:
+            if _is_executable(_chromedriver_path):
+                return _chromedriver_path
+
+            cached = _read_cache()
+            if cached:
+                _chromedriver_path = cached
+                return cached
+
+        _chromedriver_path = _install_chromedriver()
+        return _chromedriver_path
+
+
+def start_chrome(options, profile=None, attach=None):
+    """
+    Launch Chrome with the cached chromedriver and the chosen launch profile.
+
+    With `attach` (or SKK_CHROME_ATTACH) set to host:port the driver connects to an already
+    running Chrome instead and works in a tab of its own. The cached chromedriver is
+    re-resolved once if Chrome rejects it as stale.
+    """
+    profile = profile or os.environ.get(CHROME_PROFILE_ENV, "default")
+    if profile not in CHROME_PROFILES:
+        raise ValueError(f"Unknown Chrome profile {profile!r}, expected one of {CHROME_PROFILES}")
+
+    attach = attach or os.environ.get(CHROME_ATTACH_ENV)
+    if attach:
+        # launch flags belong to the running browser; only the attach address and load strategy apply
+        options = webdriver.ChromeOptions()
+        options.debugger_address = attach
+        if profile == "lean":
+            options.page_load_strategy = "eager"
+    else:
+        apply_profile(options, profile)
+
+    try:
+        driver = webdriver.Chrome(options=options, service=Service(chromedriver_path()))
+    except SessionNotCreatedException as e:
+        if os.environ.get("CHROMEDRIVER_PATH"):
+            raise
+        # usually a Chrome update that the cached driver does not support
+        print(f"Cached chromedriver was rejected, resolving it again: {e.msg}")
+        driver = webdriver.Chrome(options=options, service=Service(chromedriver_path(refresh=True)))
+
+    driver.launch_profile = profile
+    driver.attached = bool(attach)
+    driver.attach_address = attach
+    # further tabs this driver opened in an attached browser, closed along with it by abort_driver
+    driver.extra_handles = []
+    # set by abort_driver once a deadline killed this driver
+    driver.aborted = False
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    if attach:
+        # several drivers can share the warm browser, so each gets its own tab
+        driver.switch_to.new_window("tab")
+        driver.owned_handle = driver.current_window_handle
+    prepare_tab(driver)
+    return driver
+
+
+def driver_alive(driver):
+    """Check that the browser session still answers commands"""
+    try:
+        driver.window_handles
+        return True
+    except Exception:
+        return False
+
+
+def classify_failure(driver, deadline, exc=None):
+    """
+    Error class of a failed submission or harvest: BROWSER_FAILED when the browser died on its own,
+    DEADLINE_EXCEEDED when `deadline` ran out, else the class name of `exc` (SubmissionNotConfirmed without one)
+    """
+    if deadline.expired():
+        return DEADLINE_EXCEEDED
+    if not driver_alive(driver):
+        # neither the site nor the item is at fault
+        return BROWSER_FAILED
+    return type(exc).__name__ if exc is not None else "SubmissionNotConfirmed"
+
+
+class ChromeSession:
+    """Driver handling shared by the page classes, which start `self.driver` from `self.options` and `self.launch_profile`"""
+
+    def restart_driver(self):
+        """Replace a driver that a deadline aborted or that died"""
+        try:
+            close_driver(self.driver)
+        except Exception:
+            pass
+        self.driver = start_chrome(self.options, self.launch_profile)
+        self.driver.implicitly_wait(IMPLICIT_WAIT)
+
+    def ensure_driver(self):
+        """Restart the driver if it was aborted or died; returns False when no new browser could be started"""
+        if not self.driver.aborted and driver_alive(self.driver):
+            return True
+        try:
+            self.restart_driver()
+            return True
+        except Exception as e:
+            print(f"Could not restart the browser: {e}")
+            return False
+
+
+def close_driver(driver):
+    """Quit a launched browser, or just close our tab and chromedriver when attached to a shared one"""
+    if not getattr(driver, "attached", False):
+        driver.quit()
+        return
+
+    try:
+        if driver.owned_handle in driver.window_handles:
+            driver.switch_to.window(driver.owned_handle)
+            driver.close()
+    finally:
+        driver.service.stop()
+
+
+def abort_driver(driver):
+    """
+    Kill a driver from another thread so whatever call is blocked on it fails immediately.
+
+    chromedriver and the Chrome it launched are killed outright; an attached warm Chrome is not a
+    child of chromedriver and survives, so the tabs this driver opened in it are closed through its
+    DevTools endpoint instead. The driver is unusable afterwards and has to be replaced.
+    """
+    driver.aborted = True
+    process = driver.service.process
+    if process is not None:
+        for pid in reversed(_process_tree(process.pid)):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        process.kill()
+
+    if getattr(driver, "attached", False):
+        for handle in [driver.owned_handle] + driver.extra_handles:
+            close_devtools_target(driver.attach_address, handle)
+
+
+def close_devtools_target(address, handle, timeout=5):
+    """Close one tab of a Chrome listening on `address` without going through chromedriver"""
+    # chromedriver window handles are DevTools target ids, prefixed with CDwindow- by older versions
+    target_id = handle[len("CDwindow-"):] if handle.startswith("CDwindow-") else handle
+    try:
+        with urllib.request.urlopen(f"http://{address}/json/close/{target_id}", timeout=timeout):
+            pass
+    except Exception as e:
+        print(f"Could not close tab {target_id} of the warm Chrome: {e}")
+
+
+def apply_profile(options, profile):
+    if profile == "lean":
+        for argument in LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        # the scripts wait for the elements they need, they never need every subresource loaded
+        options.page_load_strategy = "eager"
+
+
+def prepare_tab(driver):
+    """Apply per-tab launch profile settings; call again after switching to a newly opened tab"""
+    if getattr(driver, "launch_profile", None) != "lean":
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        print(f"Could not enable request blocking: {e}")
+
+
+def _install_chromedriver():
+    try:
+        path = ChromeDriverManager().install()
+    except Exception as e:
+        print(f"Could not resolve chromedriver online: {e}")
+        path = _read_cache() or shutil.which("chromedriver")
+        if not path:
+            raise
+        return path
+
+    _write_cache(path)
+    return path
+
+
+def _is_executable(path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _read_cache():
+    try:
+        with open(CHROMEDRIVER_CACHE, "r") as f:
+            path = json.load(f).get("path")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return path if _is_executable(path) else None
+
+
+def _write_cache(path):
+    try:
+        os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE), exist_ok=True)
+        tmp_file = f"{CHROMEDRIVER_CACHE}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"path": path}, f)
+        os.replace(tmp_file, CHROMEDRIVER_CACHE)
+    except OSError as e:
+        print(f"Could not write chromedriver cache: {e}")
+
+
+def wait_for_search_url(driver, timeout=SUBMIT_TIMEOUT):
+    """
+    Wait until the browser has navigated to a /search/ result page.
+
+    Returns the result URL, or None if the page did not get there before the deadline.
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+            lambda d: SEARCH_PATH in d.current_url
+        )
+    except TimeoutException:
+        return None
+    return driver.current_url
+
+
+def open_question_form(driver, base_url, warm=True, timeout=FORM_TIMEOUT):
+    """
+    Get the question form ready for a new question and return (textarea, mode).
+
+    With warm=True a form that is already loaded is reused, going back from a result page if
+    needed, so no page load happens; anything unexpected falls back to loading `base_url`.
+    `mode` is "deep" once Deep Research is already selected, so the menu need not be opened again.
+    """
+    if warm:
+        if SEARCH_PATH in driver.current_url:
+            driver.back()
+        if driver.current_url.rstrip("/") == base_url.rstrip("/"):
+            mode = _wait_for_form(driver, FORM_RESET_TIMEOUT)
+            if mode:
+                return driver.find_element(By.CSS_SELECTOR, "form textarea"), mode
+
+    driver.get(base_url)
+    form = WebDriverWait(driver, timeout).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "form"))
+    )
+    textarea = form.find_element(By.CSS_SELECTOR, "textarea")
+    return textarea, _wait_for_form(driver, min(timeout, FORM_RESET_TIMEOUT))
+
+
+def _wait_for_form(driver, timeout):
+    # polled through JS so an absent form does not sit out the implicit wait
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+            lambda d: d.execute_script(FORM_STATE_JS)
+        )
+    except TimeoutException:
+        return None
+
+
+def wait_for_answer(driver, timeout=HARVEST_TIMEOUT, settle=ANSWER_SETTLE):
+    """
+    Watch the response area until the answer stops changing.
+
+    Returns ANSWER_DONE once a Copy button is present, nothing is busy and the text has been
+    stable for `settle` seconds, or ANSWER_RUNNING if the answer was still moving at the deadline.
+    """
+    deadline = time.monotonic() + timeout
+    last_state = None
+    stable_since = time.monotonic()
+
+    while time.monotonic() < deadline:
+        state = driver.execute_script(ANSWER_STATE_JS)
+        now = time.monotonic()
+        if state != last_state:
+            last_state = state
+            stable_since = now
+        elif state[0] > 0 and not state[2] and now - stable_since >= settle:
+            return ANSWER_DONE
+        time.sleep(0.5)
+
+    return ANSWER_RUNNING
+
+
+class AnswerNotExtracted(Exception):
+    """The answer looked finished, but no text could be read back from the page"""
+
+
+def _answer_text(driver):
+    text = driver.execute_script(LAST_ANSWER_TEXT_JS)
+    if not text or not text.strip():
+        # an empty answer is never what Deepwiki produced; the selector missed it
+        raise AnswerNotExtracted("no answer text found next to the last Copy button")
+    return text
+
+
+def copy_response(driver, wait, mode="page"):
+    """
+    Press the last answer's "Copy response" action and return the copied text without touching the real clipboard.
+
+    In "dom" and "page" mode, raises AnswerNotExtracted when no text can be read, so the harvest
+    counts as failed instead of as an answer without findings.
+    """
+    if mode == "dom":
+        wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, '[aria-label="Copy"]')))
+        return _answer_text(driver)
+
+    if mode == "page":
+        driver.execute_script(CLIPBOARD_HOOK_JS)
+
+    #  this would click the copy button
+    copy_button_selector = (By.CSS_SELECTOR, '[aria-label="Copy"]')
+    all_copy_buttons = wait.until(
+        EC.presence_of_all_elements_located(copy_button_selector)
+    )
+    last_copy_button = all_copy_buttons[-1]
+    wait.until(EC.element_to_be_clickable(last_copy_button)).click()
+
+    xpath = "//div[@role='menuitem' and normalize-space(text())='Copy response']"
+    el = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
+    el.click()
+
+    if mode == "clipboard":
+        import pyperclip
+        return pyperclip.paste()
+
+    try:
+        return WebDriverWait(driver, 10, poll_frequency=0.2).until(
+            lambda d: d.execute_script("return window.__copiedText;")
+        )
+    except TimeoutException:
+        print("Copied text was not captured from the page, reading the answer from the DOM")
+        return _answer_text(driver)
+
+
+# page-side numbers for one load: timings in ms, bytes over the wire and JS heap
+PAGE_METRICS_JS = """
+const nav = performance.getEntriesByType('navigation')[0] || {};
+const resources = performance.getEntriesByType('resource');
+return {
+  dom_content_loaded: nav.domContentLoadedEventEnd || 0,
+  load: nav.loadEventEnd || 0,
+  requests: resources.length,
+  transfer_bytes: resources.reduce((total, r) => total + (r.transferSize || 0), (nav.transferSize || 0)),
+  js_heap_bytes: (performance.memory && performance.memory.usedJSHeapSize) || 0
+};
+"""
+
+
+def find_chrome_binary():
+    binary = os.environ.get("CHROME_BINARY")
+    if binary:
+        return binary
+    for name in CHROME_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise FileNotFoundError(f"No Chrome binary found (tried {', '.join(CHROME_BINARIES)}); set CHROME_BINARY")
+
+
+def debugger_address(port=WARM_CHROME_PORT):
+    return f"127.0.0.1:{port}"
+
+
+def is_chrome_listening(address, timeout=1):
+    try:
+        with urllib.request.urlopen(f"http://{address}/json/version", timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+def start_warm_chrome(port=WARM_CHROME_PORT, user_data_dir=WARM_CHROME_PROFILE_DIR, profile="default",
+                      headless=True, timeout=30):
+    """
+    Start a long-lived Chrome with remote debugging and a persistent profile, or reuse one already on `port`.
+
+    The browser outlives this process; drivers attach to it with SKK_CHROME_ATTACH=<address>.
+    Returns the debugger address.
+    """
+    address = debugger_address(port)
+    if is_chrome_listening(address):
+        return address
+
+    os.makedirs(user_data_dir, exist_ok=True)
+    command = [
+        find_chrome_binary(),
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={user_data_dir}",
+        "--window-size=1920,1080",
+        "--no-first-run",
+        "--no-default-browser-check",
+    ]
+    if headless:
+        command.append("--headless=new")
+    if profile == "lean":
+        command.extend(LEAN_ARGUMENTS)
+
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    with open(os.path.join(user_data_dir, "warm-chrome.pid"), "w") as f:
+        f.write(str(process.pid))
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_chrome_listening(address):
+            return address
+        if process.poll() is not None:
+            raise RuntimeError(f"Chrome exited with code {process.returncode} before remote debugging came up")
+        time.sleep(0.25)
+    raise TimeoutError(f"Chrome did not open remote debugging on {address} within {timeout}s")
+
+
+def stop_warm_chrome(user_data_dir=WARM_CHROME_PROFILE_DIR):
+    pid_file = os.path.join(user_data_dir, "warm-chrome.pid")
+    try:
+        with open(pid_file, "r") as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        print("No warm Chrome pid file found")
+        return
+    try:
+        os.kill(pid, 15)
+        print(f"Stopped warm Chrome (pid {pid})")
+    except OSError as e:
+        print(f"Could not stop warm Chrome (pid {pid}): {e}")
+    os.remove(pid_file)
+
+
+def _process_table():
+    """pid -> /proc/<pid>/status fields (Linux only, empty elsewhere)"""
+    table = {}
+    if not os.path.isdir("/proc"):
+        return table
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status", "r") as f:
+                table[int(entry)] = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+    return table
+
+
+def _process_tree(pid, table=None):
+    """`pid` followed by all of its descendants"""
+    table = _process_table() if table is None else table
+    children = {}
+    for child, fields in table.items():
+        children.setdefault(int(fields.get("PPid", "0").strip()), []).append(child)
+
+    tree = []
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def _process_tree_rss_kb(pid):
+    """Resident memory of a process and all its descendants (Linux only, 0 elsewhere)"""
+    table = _process_table()
+    return sum(int(table[current].get("VmRSS", "0 kB").split()[0])
+               for current in _process_tree(pid, table) if current in table)
+
+
+def bench_profile(profile, url, runs=3):
+    """Launch Chrome with `profile`, load `url` `runs` times and return the averaged measurements"""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--window-size=1920,1080")
+
+    started = time.monotonic()
+    driver = start_chrome(options, profile)
+    launch_seconds = time.monotonic() - started
+
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    samples = []
+    try:
+        for _ in range(runs):
+            # the first run starts on data:, where page scripts may not touch storage, so localStorage
+            # is cleared over CDP; sessionStorage belongs to the tab and only exists once it has been there
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storage_types": "local_storage"})
+            if driver.current_url.startswith(origin):
+                driver.execute_script("window.sessionStorage.clear();")
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            started = time.monotonic()
+            driver.get(url)
+            WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.CSS_SELECTOR, "form textarea")))
+            metrics = driver.execute_script(PAGE_METRICS_JS)
+            metrics["ready_seconds"] = time.monotonic() - started
+            samples.append(metrics)
+        rss_kb = _process_tree_rss_kb(driver.service.process.pid)
+    finally:
+        close_driver(driver)
+
+    result = {key: sum(sample[key] for sample in samples) / len(samples) for key in samples[0]}
+    result["launch_seconds"] = launch_seconds
+    result["browser_rss_mb"] = rss_kb / 1024
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Browser helpers shared by the automation scripts")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="compare Chrome launch profiles on the question page")
+    bench.add_argument("--url", default="https://deepwiki.com/code-423n4/2025-11-sukukfi")
+    bench.add_argument("--runs", type=int, default=3)
+    bench.add_argument("--profiles", nargs="+", choices=CHROME_PROFILES, default=list(CHROME_PROFILES))
+
+    warm = commands.add_parser("warm", help="start a persistent Chrome that drivers attach to")
+    warm.add_argument("--port", type=int, default=WARM_CHROME_PORT)
+    warm.add_argument("--user-data-dir", default=WARM_CHROME_PROFILE_DIR)
+    warm.add_argument("--profile", choices=CHROME_PROFILES, default="default")
+    warm.add_argument("--headed", action="store_true", help="show the browser window")
+
+    stop = commands.add_parser("stop-warm", help="stop the persistent Chrome")
+    stop.add_argument("--user-data-dir", default=WARM_CHROME_PROFILE_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "warm":
+        address = start_warm_chrome(args.port, args.user_data_dir, args.profile, headless=not args.headed)
+        print(f"Warm Chrome listening on {address}")
+        print(f"export {CHROME_ATTACH_ENV}={address}")
+    elif args.command == "stop-warm":
+        stop_warm_chrome(args.user_data_dir)
+    elif args.command == "bench":
+        columns = ("launch_seconds", "ready_seconds", "dom_content_loaded", "requests", "transfer_bytes",
+                   "js_heap_bytes", "browser_rss_mb")
+        print("profile".ljust(10) + "".join(column.rjust(20) for column in columns))
+        for profile in args.profiles:
+            try:
+                result = bench_profile(profile, args.url, args.runs)
+            except Exception as e:
+                print(f"{profile.ljust(10)}failed: {e}", file=sys.stderr)
+                continue
+            print(profile.ljust(10) + "".join(f"{result[column]:20.2f}" for column in columns))
+
+
+if __name__ == '__main__':
+    main()
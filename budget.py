@@ -0,0 +1,54 @@
+import threading
+import time
+
+from deadlines import Deadline
+
+# time kept free at the end of a budget for the final checkpoint and commit
+SAFETY_MARGIN = 120
+# weight of the newest item in the moving average of item durations
+EWMA_ALPHA = 0.3
+
+
+class BatchBudget:
+    """
+    Wall-clock budget for one batch that predicts how long the next item will take.
+
+    The prediction is an exponentially weighted moving average of the items finished so far,
+    starting from `initial_estimate` (best set to the per-item timeout, the worst case). A new
+    item is only started while it is predicted to finish `margin` seconds before the budget ends.
+    Without `seconds` there is no time limit and every item may start.
+    """
+
+    def __init__(self, seconds=None, initial_estimate=60, margin=SAFETY_MARGIN, alpha=EWMA_ALPHA):
+        self.deadline = Deadline(seconds) if seconds else None
+        self.estimate = initial_estimate
+        self.margin = margin
+        self.alpha = alpha
+        self.items = 0
+        self._announced = False
+        self._lock = threading.Lock()
+
+    def can_start(self, wait=0):
+        """Whether an item started after `wait` more seconds is predicted to finish inside the budget"""
+        if self.deadline is None:
+            return True
+        with self._lock:
+            fits = self.deadline.remaining() - self.margin >= wait + self.estimate
+            if not fits and not wait and not self._announced:
+                self._announced = True
+                print(f"Time budget nearly used up: {self.deadline.remaining():.0f}s left, "
+                      f"the next item is expected to take {self.estimate:.0f}s; not starting more")
+            return fits
+
+    def record(self, seconds):
+        with self._lock:
+            if self.items == 0:
+                self.estimate = seconds
+            else:
+                self.estimate = self.alpha * seconds + (1 - self.alpha) * self.estimate
+            self.items += 1
+
+    def timer(self):
+        """Return a callable that records the time since this call as one item"""
+        started = time.monotonic()
+        return lambda: self.record(time.monotonic() - started)
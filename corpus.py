@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+
+# one {"id", "qid", "question", "section"} record per line; ids are line numbers, qids are content hashes
+QUESTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.jsonl")
+QUESTION_ID_LENGTH = 12
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop spaces around dots ("Token. transfer()" -> "token.transfer()")"""
+    text = " ".join(question.split()).lower()
+    return re.sub(r"\s*\.\s*(?=\w)", ".", text)
+
+
+def question_id(question):
+    """Short, stable id of a question's normalised text"""
+    digest = hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+    return digest[:QUESTION_ID_LENGTH]
+
+
+def entry_question_id(entry):
+    """Question id of a ledger record, hashing the full text for records written before ids were stored"""
+    if entry.get("question_id"):
+        return entry["question_id"]
+    if entry.get("question"):
+        return question_id(entry["question"])
+    return None
+
+
+def iter_records(path=QUESTIONS_FILE):
+    """Stream corpus records without holding the whole corpus in memory"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_questions(path=QUESTIONS_FILE):
+    for record in iter_records(path):
+        yield record["question"]
+
+
+def load_records(path=QUESTIONS_FILE):
+    """All corpus records, in corpus order"""
+    return list(iter_records(path))
+
+
+def load_questions(path=QUESTIONS_FILE):
+    """The full question list, in corpus order"""
+    return list(iter_questions(path))
+
+
+def count_questions(path=QUESTIONS_FILE):
+    """Number of questions, read from the offset index"""
+    return len(load_index(path)["offsets"])
+
+
+def question_ids(path=QUESTIONS_FILE):
+    """Question id of every corpus record, read from the offset index"""
+    return load_index(path)["qids"]
+
+
+def remaining_count(processed_ids, path=QUESTIONS_FILE):
+    """Distinct corpus questions whose id is not in `processed_ids`"""
+    return len(set(question_ids(path)) - set(processed_ids))
+
+
+def get_question(question_index, path=QUESTIONS_FILE):
+    """Fetch a single question by its line id without parsing the rest of the corpus"""
+    return _read_record(load_index(path)["offsets"][question_index], path)["question"]
+
+
+def get_question_by_qid(qid, path=QUESTIONS_FILE):
+    """Fetch a single question by content hash, or None if the corpus does not contain it"""
+    index = load_index(path)
+    try:
+        position = index["qids"].index(qid)
+    except ValueError:
+        return None
+    return _read_record(index["offsets"][position], path)["question"]
+
+
+def _read_record(offset, path):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+def index_path(path=QUESTIONS_FILE):
+    """questions.jsonl -> questions.idx"""
+    return os.path.splitext(path)[0] + ".idx"
+
+
+def load_index(path=QUESTIONS_FILE):
+    """
+    Byte offset and question id of every record in the corpus.
+
+    The index lives next to the corpus and is rebuilt whenever the corpus size or mtime changes.
+    """
+    stat = os.stat(path)
+    try:
+        with open(index_path(path), "r") as f:
+            index = json.load(f)
+        if index["size"] == stat.st_size and index["mtime_ns"] == stat.st_mtime_ns and "qids" in index:
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return build_index(path)
+
+
+def build_index(path=QUESTIONS_FILE):
+    offsets = []
+    qids = []
+    position = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                offsets.append(position)
+                qids.append(record.get("qid") or question_id(record["question"]))
+            position += len(line)
+
+    stat = os.stat(path)
+    index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "offsets": offsets, "qids": qids}
+    try:
+        with open(index_path(path), "w") as f:
+            json.dump(index, f)
+    except OSError as e:
+        print(f"Could not write question index: {e}")
+    return index
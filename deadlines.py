@@ -0,0 +1,70 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# wall-clock budget for submitting one question, from loading the form to its /search/ URL
+QUESTION_TIMEOUT = 180
+# extra time a harvest gets on top of its answer wait for loading the page and copying the text
+HARVEST_MARGIN = 60
+
+
+class Deadline:
+    """A fixed point in time that driver waits are cut down to"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self, cap=None):
+        """Seconds left (never negative), no more than `cap` when given"""
+        left = max(0.0, self.expires - time.monotonic())
+        return min(left, cap) if cap is not None else left
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+
+class Watchdog:
+    """
+    One background thread that calls `on_expire` for every watched deadline that passes.
+
+    It is the backstop for driver calls that ignore their own timeouts: the callback
+    (usually browser.abort_driver) kills the driver so the blocked call fails at once.
+    """
+
+    def __init__(self, poll=1):
+        self.poll = poll
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextmanager
+    def watch(self, deadline, on_expire):
+        """Call `on_expire` if `deadline` passes before the block finishes"""
+        token = object()
+        with self._lock:
+            self._watched[id(token)] = (deadline, on_expire)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        try:
+            yield deadline
+        finally:
+            with self._lock:
+                self._watched.pop(id(token), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll)
+            with self._lock:
+                due = [key for key, (deadline, _) in self._watched.items() if deadline.expired()]
+                fired = [self._watched.pop(key) for key in due]
+            for deadline, on_expire in fired:
+                print(f"Deadline of {deadline.seconds}s passed, aborting the driver operation")
+                try:
+                    on_expire()
+                except Exception as e:
+                    print(f"Error aborting the driver operation: {e}")
+
+
+watchdog = Watchdog()
@@ -0,0 +1,124 @@
+import argparse
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+from corpus import load_records, normalize_question
+
+# MinHash signatures are split into BANDS bands of NUM_PERM // BANDS rows for LSH bucketing;
+# 32 bands of 2 rows put the candidate cut-off near 0.18 Jaccard, well below any useful threshold.
+# Reworded questions share vocabulary rather than phrases, so shingles are single words by default
+NUM_PERM = 64
+BANDS = 32
+SHINGLE_SIZE = 1
+DEFAULT_THRESHOLD = 0.5
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(7575)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hashed word n-grams of the normalised question"""
+    words = re.findall(r"\w+", normalize_question(text))
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") for g in grams}
+
+
+def minhash(shingle_set):
+    return tuple(min((a * h + b) % _PRIME for h in shingle_set) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """Groups texts whose shingle sets overlap by at least `threshold` (Jaccard)"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.keys = []
+        self._shingles = {}
+        self._buckets = defaultdict(list)
+
+    def add(self, key, text):
+        if key in self._shingles:
+            return
+        shingle_set = shingles(text)
+        signature = minhash(shingle_set)
+        rows = NUM_PERM // BANDS
+        self.keys.append(key)
+        self._shingles[key] = shingle_set
+        for band in range(BANDS):
+            self._buckets[(band, signature[band * rows:(band + 1) * rows])].append(key)
+
+    def groups(self):
+        """Lists of keys in insertion order; singletons are included"""
+        parent = {key: key for key in self.keys}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        checked = set()
+        for bucket in self._buckets.values():
+            for i, a in enumerate(bucket):
+                for b in bucket[i + 1:]:
+                    if (a, b) in checked:
+                        continue
+                    checked.add((a, b))
+                    if jaccard(self._shingles[a], self._shingles[b]) >= self.threshold:
+                        root_a, root_b = find(a), find(b)
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+
+        grouped = defaultdict(list)
+        for key in self.keys:
+            grouped[find(key)].append(key)
+        return list(grouped.values())
+
+
+def near_duplicate_groups(records, threshold=DEFAULT_THRESHOLD):
+    """Map every qid to the qids of its near-duplicate group (including itself)"""
+    index = NearDuplicateIndex(threshold)
+    for record in records:
+        index.add(record["qid"], record["question"])
+
+    membership = {}
+    for group in index.groups():
+        for qid in group:
+            membership[qid] = group
+    return membership
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List near-duplicate questions in the corpus")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    records = load_records()
+    text = {record["qid"]: record["question"] for record in records}
+    index = NearDuplicateIndex(args.threshold)
+    for record in records:
+        index.add(record["qid"], record["question"])
+
+    groups = [group for group in index.groups() if len(group) > 1]
+    for group in groups:
+        print(f"\n=== {len(group)} similar questions ===")
+        for qid in group:
+            print(f"  {qid}: {text[qid][:100]}...")
+
+    redundant = sum(len(group) - 1 for group in groups)
+    print(f"\n{len(groups)} groups, {redundant} of {len(records)} questions are near-duplicates at {args.threshold}")
+
+
+if __name__ == '__main__':
+    main()
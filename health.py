@@ -0,0 +1,116 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+PROBE_TIMEOUT = 15
+# consecutive failed driver operations after which the breaker opens
+FAILURE_THRESHOLD = 5
+# how long an open breaker pauses work before a single probe tests recovery
+COOLDOWN = 120
+# how long one caller waits on an open breaker before giving up on its item
+MAX_WAIT = 600
+# the error class reported by an operation the open breaker refused
+CIRCUIT_OPEN = "CircuitOpen"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+
+
+def probe(url, timeout=PROBE_TIMEOUT):
+    """
+    One plain HTTP request to the site; returns (healthy, detail).
+
+    Anything but a server error or 429 counts as healthy, since a 4xx still means the
+    site answers and the browser will get through.
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return True, f"HTTP {response.status}"
+    except urllib.error.HTTPError as e:
+        return e.code < 500 and e.code != 429, f"HTTP {e.code}"
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def preflight(url, attempts=3, delay=10):
+    """Probe the site before a batch starts; returns False when it stayed unreachable"""
+    for attempt in range(1, attempts + 1):
+        healthy, detail = probe(url)
+        if healthy:
+            return True
+        print(f"Pre-flight probe of {url} failed ({detail}), attempt {attempt}/{attempts}")
+        if attempt < attempts:
+            time.sleep(delay)
+    print(f"{url} is not reachable, skipping this batch")
+    return False
+
+
+class CircuitBreaker:
+    """
+    Pauses every driver operation once `threshold` of them failed in a row.
+
+    While open, callers wait in wait(); after `cooldown` seconds exactly one of them sends a
+    probe request (half-open). A healthy probe closes the breaker and everyone resumes, a failed
+    one keeps it open for another cooldown.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print("Circuit breaker closed, resuming work")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == CLOSED and self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                print(f"Circuit breaker opened after {self.failures} consecutive failures, "
+                      f"pausing for {self.cooldown}s")
+
+    def wait(self, url, max_wait=MAX_WAIT):
+        """Block while the breaker is open; returns False if it did not close within `max_wait` seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                if self.state == CLOSED:
+                    return True
+                should_probe = (self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown)
+                if should_probe:
+                    self.state = HALF_OPEN
+
+            if should_probe:
+                healthy, detail = probe(url)
+                if healthy:
+                    self.record_success()
+                    return True
+                with self._lock:
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+                print(f"Recovery probe of {url} failed ({detail}), staying open for {self.cooldown}s")
+
+            now = time.monotonic()
+            if now >= deadline:
+                return False
+            with self._lock:
+                until_probe = self.opened_at + self.cooldown - now
+            time.sleep(min(5, max(0.1, min(until_probe, deadline - now))))
+
+
+# one breaker for every driver class in the process
+breaker = CircuitBreaker()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; leases then only coordinate threads of one process
+    fcntl = None
+
+# claims shared by every runner working out of the same directory
+LEASES_FILE = "leases.json"
+# an unfinished claim is released once it is this old, so a crashed runner cannot hold items forever
+LEASE_TTL = 600
+# finished items stay claimed for this long so runners with an older view of the ledgers skip them
+DONE_TTL = 24 * 3600
+
+_thread_lock = threading.Lock()
+
+
+def share_of(qid, count):
+    """
+    Which of `count` runners a question id belongs to.
+
+    Runners on separate machines (the forward and reversed CI jobs) cannot share a lease file, so
+    each works through its own share of the corpus first and only then moves on to the others'.
+    """
+    return int(qid, 16) % count
+
+
+def parse_share(value):
+    """'1/2' -> (1, 2): this runner's index and the number of runners splitting the corpus"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT such as 0/2, got {value!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"index must be between 0 and {count - 1}, got {index}")
+    return index, count
+
+
+def default_owner():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseStore:
+    """Atomic, expiring claims on work items (question ids) stored in a JSON file"""
+
+    def __init__(self, path=LEASES_FILE, owner=None, ttl=LEASE_TTL):
+        self.path = path
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+
+    @contextmanager
+    def _locked(self):
+        with _thread_lock, open(f"{self.path}.lock", "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                leases = self._read()
+                now = time.time()
+                leases = {key: lease for key, lease in leases.items() if lease.get("expires", 0) > now}
+                yield leases
+                self._write(leases)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, leases):
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(leases, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def claim(self, keys, count=1):
+        """Claim up to `count` of `keys` (in order) that no other runner holds; returns the claimed keys"""
+        claimed = []
+        with self._locked() as leases:
+            expires = time.time() + self.ttl
+            for key in keys:
+                if len(claimed) >= count:
+                    break
+                lease = leases.get(key)
+                if lease and (lease.get("done") or lease["owner"] != self.owner):
+                    continue
+                leases[key] = {"owner": self.owner, "expires": expires}
+                claimed.append(key)
+        return claimed
+
+    def renew(self, keys):
+        with self._locked() as leases:
+            expires = time.time() + self.ttl
+            for key in keys:
+                lease = leases.get(key)
+                if lease and lease["owner"] == self.owner and not lease.get("done"):
+                    lease["expires"] = expires
+
+    @contextmanager
+    def held(self, keys):
+        """Renew the claims on `keys` every third of the TTL while the block runs, however long it takes"""
+        stopped = threading.Event()
+
+        def keep_renewing():
+            while not stopped.wait(self.ttl / 3):
+                try:
+                    self.renew(keys)
+                except Exception as e:
+                    print(f"Error renewing leases: {e}")
+
+        renewer = threading.Thread(target=keep_renewing, name="lease-renewal", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            renewer.join()
+
+    def release(self, keys):
+        """Give up claims without finishing them, e.g. after a failed submission"""
+        with self._locked() as leases:
+            for key in keys:
+                lease = leases.get(key)
+                if lease and lease["owner"] == self.owner and not lease.get("done"):
+                    del leases[key]
+
+    def complete(self, keys):
+        """Mark claimed items as finished"""
+        with self._locked() as leases:
+            expires = time.time() + DONE_TTL
+            for key in keys:
+                leases[key] = {"owner": self.owner, "expires": expires, "done": True}
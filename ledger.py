@@ -0,0 +1,312 @@
+import atexit
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the ledgers then only coordinate threads of one process
+    fcntl = None
+
+# every submission is appended as one line to <ledger>.jsonl; the journal is folded back
+# into the JSON array the other scripts read every COMPACT_EVERY appends and at exit
+COMPACT_EVERY = 100
+# seconds between two runs of a Checkpointer
+CHECKPOINT_EVERY = 900
+
+_lock = threading.RLock()
+# open <ledger>.lock files this process holds an flock on, so nested calls do not lock again
+_held = {}
+_appends = {}
+_batches = []
+
+
+def journal_path(path):
+    """collections.json -> collections.jsonl"""
+    return os.path.splitext(path)[0] + ".jsonl"
+
+
+@contextmanager
+def locked(path):
+    """Hold the ledger against other threads and, through <ledger>.lock, against other processes"""
+    with _lock:
+        if path in _held:
+            yield
+            return
+        with open(f"{path}.lock", "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _held[path] = lock_file
+            try:
+                yield
+            finally:
+                del _held[path]
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _mirror(path):
+    """
+    Yield the ledger database around a write (ledger lock held) if it is in step with the files, else None.
+
+    A database that was in step is stamped again afterwards; one that was not, e.g. because a
+    process without SKK_LEDGER_DB wrote the files, is re-imported on its next query instead.
+    """
+    db = _ledger_db()
+    if db is None or not db.is_synced(path):
+        yield None
+        return
+    yield db
+    db.stamp(path)
+
+
+def load_entries(path):
+    """Return every record in the ledger, including journaled ones that are not compacted yet"""
+    with locked(path):
+        return _read_array(path) + _read_journal(path)
+
+
+def append_entry(path, record):
+    """Append one record to the ledger's journal without rewriting the array file"""
+    with locked(path), _mirror(path) as db:
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(journal_path(path), "ab+") as f:
+            # start on a fresh line if a crash left a partial record behind
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if db:
+            db.record(path, record)
+
+        _appends[path] = _appends.get(path, 0) + 1
+        if _appends[path] >= COMPACT_EVERY:
+            compact(path)
+
+
+def compact(path):
+    """Fold the journal into the JSON array file and remove it"""
+    with locked(path), _mirror(path):
+        records = _read_journal(path)
+        _appends[path] = 0
+        if not records:
+            return
+
+        try:
+            data = _read_array(path)
+        except ValueError as e:
+            # never replace a ledger we could not read; the journal keeps the new records
+            print(f"Not compacting {path}, it could not be parsed: {e}")
+            return
+
+        write_entries(path, data + records)
+        os.remove(journal_path(path))
+
+
+def update_entries(path, update):
+    """Compact the ledger, let `update` modify the records in place and write them back"""
+    with locked(path):
+        compact(path)
+        data = _read_array(path)
+        update(data)
+        write_entries(path, data)
+
+
+def mark_report_generated(path, url):
+    """Flag the first record with this URL as harvested"""
+    mark_reports_generated(path, [url])
+
+
+def mark_reports_generated(path, urls):
+    """Flag the first record of each URL as harvested in a single rewrite"""
+    urls = set(urls)
+    if not urls:
+        return
+
+    def mark(data):
+        seen = set()
+        for item in data:
+            url = item.get("url")
+            if url in urls and url not in seen:
+                item["report_generated"] = True
+                seen.add(url)
+
+    with locked(path), _mirror(path) as db:
+        update_entries(path, mark)
+        if db:
+            for url in urls:
+                db.mark_report_generated(path, url)
+
+
+class StatusBatch:
+    """
+    In-memory URL -> record index for one ledger that queues report_generated flips.
+
+    A URL the index already shows as harvested is not written again. Flips are written out
+    together once `flush_every` are queued, once `flush_interval` seconds have passed since
+    the last write, on flush(), on close() and at interpreter exit.
+    """
+
+    def __init__(self, path, flush_every=25, flush_interval=60):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.index = {}
+        for item in load_entries(path):
+            self.index.setdefault(item.get("url"), item)
+        self._pending = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        _batches.append(self)
+        atexit.register(self.flush)
+
+    def is_generated(self, url):
+        item = self.index.get(url)
+        return bool(item and item.get("report_generated"))
+
+    def mark(self, url):
+        with self._lock:
+            if self.is_generated(url):
+                return
+            # a URL submitted after the index was loaded is queued all the same; the write-out finds its record
+            self.index.setdefault(url, {"url": url})["report_generated"] = True
+            self._pending.add(url)
+            due = (len(self._pending) >= self.flush_every
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            urls, self._pending = self._pending, set()
+            self._last_flush = time.monotonic()
+        if not urls:
+            return
+        try:
+            mark_reports_generated(self.path, urls)
+        except Exception as e:
+            print(f"Error flushing report status to {self.path}: {e}")
+            with self._lock:
+                self._pending |= urls
+
+    def close(self):
+        """Write out what is queued and stop tracking this batch once its harvest run is over"""
+        self.flush()
+        if self in _batches:
+            _batches.remove(self)
+        atexit.unregister(self.flush)
+
+
+def checkpoint():
+    """Flush every StatusBatch and fold every journal this process appended to into its array file"""
+    for batch in list(_batches):
+        batch.flush()
+    for path in list(_appends):
+        compact(path)
+
+
+class Checkpointer(threading.Thread):
+    """Every `interval` seconds writes all ledger state out and then runs `command` (e.g. a git commit and push)"""
+
+    def __init__(self, interval=CHECKPOINT_EVERY, command=None):
+        super(Checkpointer, self).__init__(name="checkpoint", daemon=True)
+        self.interval = interval
+        self.command = command
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        with self._lock:
+            try:
+                checkpoint()
+            except Exception as e:
+                print(f"Error writing the ledgers out: {e}")
+                return
+            if self.command:
+                result = subprocess.run(self.command, shell=True)
+                if result.returncode:
+                    print(f"Checkpoint command exited with code {result.returncode}")
+
+    def stop(self):
+        """Stop the timer and take one last checkpoint"""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        self.checkpoint()
+
+
+def write_entries(path, data):
+    """Atomically replace the ledger array file"""
+    with locked(path):
+        # per process, so a runner never replaces the ledger with another one's half-written file
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+
+def clear(path):
+    """Empty the ledger and drop its journal"""
+    with locked(path), _mirror(path) as db:
+        if os.path.exists(journal_path(path)):
+            os.remove(journal_path(path))
+        _appends[path] = 0
+        write_entries(path, [])
+        if db:
+            db.clear(path)
+
+
+def _ledger_db():
+    # imported lazily: sqlite_ledger builds on this module
+    from sqlite_ledger import get_db
+    return get_db()
+
+
+def _read_array(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    return json.loads(content) if content else []
+
+
+def _read_journal(path):
+    records = []
+    journal = journal_path(path)
+    if not os.path.exists(journal):
+        return records
+
+    with open(journal, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # a crash mid-append can only damage the last line
+                print(f"Skipping unreadable line {line_number} in {journal}")
+    return records
+
+
+@atexit.register
+def _compact_on_exit():
+    for path in list(_appends):
+        try:
+            compact(path)
+        except Exception as e:
+            print(f"Error compacting {path}: {e}")
@@ -0,0 +1,152 @@
+import time
+
+from audit import BASE_URL
+from browser import BROWSER_GONE, DEADLINE_EXCEEDED, SEARCH_PATH, SUBMIT_TIMEOUT, abort_driver, driver_alive, prepare_tab
+from deadlines import QUESTION_TIMEOUT, Deadline, watchdog
+from health import CIRCUIT_OPEN, breaker
+import ratelimit
+
+
+class TabMultiplexer:
+    """
+    Submits questions round-robin across `tabs` window handles of one Deepwiki driver.
+
+    Each tab tracks its own in-flight question; a tab is free again once its page reaches a
+    /search/ URL (recorded in the ledger) or its SUBMIT_TIMEOUT deadline passes (reported as failed).
+    Filling in the form gets `question_timeout` seconds before the whole driver is aborted.
+    """
+
+    def __init__(self, bot, tabs=3, is_reversed=False, on_result=None, submit_timeout=SUBMIT_TIMEOUT,
+                 question_timeout=QUESTION_TIMEOUT):
+        self.bot = bot
+        self.driver = bot.driver
+        self.is_reversed = is_reversed
+        self.on_result = on_result
+        self.submit_timeout = submit_timeout
+        self.question_timeout = question_timeout
+
+        self.handles = [self.driver.current_window_handle]
+        while len(self.handles) < max(1, tabs):
+            self.driver.switch_to.new_window("tab")
+            # request blocking is per tab, so new tabs need the launch profile applied again
+            prepare_tab(self.driver)
+            self.handles.append(self.driver.current_window_handle)
+            if getattr(self.driver, "attached", False):
+                self.driver.extra_handles.append(self.driver.current_window_handle)
+
+        # handle -> (question, key, started, deadline)
+        self.inflight = {}
+        self._next = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.drain()
+        finally:
+            self.close_extra_tabs()
+
+    def submit(self, question, key=None):
+        """Start a question in the next free tab, waiting for one to free up if all are busy"""
+        handle = self._free_tab()
+        while handle is None:
+            time.sleep(0.5)
+            self.poll()
+            handle = self._free_tab()
+
+        if not breaker.wait(BASE_URL):
+            print("Deepwiki is still failing, not submitting")
+            self._finish(question, key, None, CIRCUIT_OPEN)
+            return
+
+        ratelimit.submissions.acquire()
+        self.driver.switch_to.window(handle)
+        started = time.monotonic()
+        deadline = Deadline(self.question_timeout)
+        try:
+            with watchdog.watch(deadline, lambda: abort_driver(self.driver)):
+                self.bot.submit_question(question, deadline.remaining())
+        except Exception as e:
+            print(f"There was an error submitting in tab {handle}: {e}")
+            if deadline.expired():
+                # the question used up its time, as in Deepwiki.ask_question; the driver is gone now
+                breaker.record_failure()
+                ratelimit.submissions.failure()
+                self._finish(question, key, None, DEADLINE_EXCEEDED)
+                return
+            if not driver_alive(self.driver):
+                # the local browser died; that is neither the site's nor the question's fault
+                self._finish(question, key, None, BROWSER_GONE)
+                return
+            breaker.record_failure()
+            ratelimit.submissions.failure()
+            self._finish(question, key, None, type(e).__name__)
+            return
+        self.inflight[handle] = (question, key, started, time.monotonic() + self.submit_timeout)
+
+    def poll(self):
+        """Check every busy tab once and record the ones that have navigated or timed out"""
+        for handle, (question, key, started, deadline) in list(self.inflight.items()):
+            try:
+                self.driver.switch_to.window(handle)
+                url = self.driver.current_url
+            except Exception as e:
+                print(f"Tab {handle} stopped responding: {e}")
+                if getattr(self.driver, "aborted", False) or not driver_alive(self.driver):
+                    self._put_back_inflight()
+                    return
+                url = ""
+                deadline = 0
+
+            if SEARCH_PATH in url:
+                del self.inflight[handle]
+                self.bot.save_to_collections(question, url, self.is_reversed)
+                breaker.record_success()
+                ratelimit.submissions.success(time.monotonic() - started)
+                self._finish(question, key, url)
+            elif time.monotonic() >= deadline:
+                del self.inflight[handle]
+                print(f"Submission was not confirmed in tab {handle}, still on {url}; not saving it")
+                breaker.record_failure()
+                ratelimit.submissions.failure()
+                self._finish(question, key, None, "SubmissionNotConfirmed")
+
+    def _put_back_inflight(self):
+        # the whole browser is gone, so every tab's question goes back untouched
+        for handle, (question, key, started, deadline) in list(self.inflight.items()):
+            del self.inflight[handle]
+            self._finish(question, key, None, BROWSER_GONE)
+
+    def drain(self):
+        while self.inflight:
+            self.poll()
+            if self.inflight:
+                time.sleep(0.5)
+
+    def close_extra_tabs(self):
+        for handle in self.handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception:
+                pass
+            if handle in getattr(self.driver, "extra_handles", ()):
+                self.driver.extra_handles.remove(handle)
+        try:
+            self.driver.switch_to.window(self.handles[0])
+        except Exception:
+            pass
+        self.handles = self.handles[:1]
+
+    def _free_tab(self):
+        for offset in range(len(self.handles)):
+            handle = self.handles[(self._next + offset) % len(self.handles)]
+            if handle not in self.inflight:
+                self._next = (self._next + offset + 1) % len(self.handles)
+                return handle
+        return None
+
+    def _finish(self, question, key, url, error=None):
+        if self.on_result:
+            self.on_result(question, key, url, error)
@@ -0,0 +1,67 @@
+import argparse
+
+from browser import EXTRACT_MODES
+from corpus import remaining_count
+from deadlines import Deadline
+from ledger import CHECKPOINT_EVERY, Checkpointer
+from pipeline import pending_work, run_pipeline
+from run_audit import load_processed_questions
+
+# GitHub-hosted jobs are cut off after six hours; leave room for setup and the final push
+DEFAULT_BUDGET = 5 * 3600 + 30 * 60
+# a pass is not started with less time than this left
+MIN_PASS = 300
+
+
+def run_campaign(budget=DEFAULT_BUDGET, checkpoint_every=CHECKPOINT_EVERY, checkpoint_cmd=None, extract="page"):
+    """
+    Work through the whole remaining queue in one process until `budget` seconds are used up.
+
+    Each pass runs the streaming pipeline over every pending question, answer and report; another
+    pass starts while time is left and the last one shrank the queue. State is checkpointed
+    every `checkpoint_every` seconds and once more at the end.
+    """
+    deadline = Deadline(budget)
+    checkpointer = Checkpointer(checkpoint_every, checkpoint_cmd)
+    checkpointer.start()
+
+    passes = 0
+    waiting = pending_work()
+    try:
+        while waiting and deadline.remaining() >= MIN_PASS:
+            passes += 1
+            print(f"\n=== Pass {passes}: {waiting} steps of work left, {deadline.remaining() / 60:.0f} minutes left ===")
+            run_pipeline(limit=None, extract=extract, deadline=deadline)
+
+            before, waiting = waiting, pending_work()
+            if waiting >= before:
+                print("The last pass made no progress, stopping")
+                break
+    finally:
+        checkpointer.stop()
+
+    print("\n=== Campaign summary ===")
+    print(f"Passes: {passes}")
+    print(f"Time used: {(budget - deadline.remaining()) / 60:.0f} minutes")
+    print(f"Questions still unsubmitted: {remaining_count(load_processed_questions())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the whole remaining queue in one long-lived process")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="seconds of wall-clock time to use")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help="seconds between checkpoints of the ledgers")
+    parser.add_argument("--checkpoint-cmd", default=None,
+                        help="shell command run after every checkpoint, e.g. to commit and push the ledgers")
+    parser.add_argument("--extract", choices=EXTRACT_MODES, default="page",
+                        help="how answer text is read back (clipboard needs a display)")
+    args = parser.parse_args()
+
+    try:
+        run_campaign(args.budget, args.checkpoint_every, args.checkpoint_cmd, args.extract)
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import argparse
+import queue
+import threading
+import time
+from pathlib import Path
+
+from audit import BASE_URL, GetReports
+from audit_validation import GetValidatedReports, Validator
+from browser import ANSWER_ABORTED, ANSWER_RUNNING, BROWSER_FAILED, EXTRACT_MODES, close_driver
+from corpus import load_records
+from health import CIRCUIT_OPEN, preflight
+from run_audit import load_processed_questions
+import run_report
+import run_validator
+import run_validator_report
+from session_pool import DeepwikiPool
+
+# bounded hand-off between stages so a fast stage cannot run far ahead of a slow one
+QUEUE_SIZE = 10
+# unfinished answers are looked at again after REQUEUE_DELAY seconds, at most MAX_REQUEUES times
+REQUEUE_DELAY = 60
+MAX_REQUEUES = 20
+# how long one harvest attempt watches an answer before handing the URL back
+HARVEST_POLL = 30
+
+STOP = object()
+REQUEUE = object()
+
+
+class Stage(threading.Thread):
+    """
+    One pipeline step running in its own thread with its own browser.
+
+    Items come from `backlog` (work left over from earlier runs) and then `inbox`. The handler
+    returns the item for the next stage, None when there is nothing to pass on, or REQUEUE to
+    see the same item again after REQUEUE_DELAY seconds.
+    """
+
+    def __init__(self, name, handler, inbox, outbox=None, backlog=(), deadline=None):
+        super(Stage, self).__init__(name=name, daemon=True)
+        self.handler = handler
+        # past this Deadline the stage stops; whatever is left stays pending in the ledgers
+        self.deadline = deadline
+        self.inbox = inbox
+        self.outbox = outbox
+        self.backlog = list(backlog)
+        self.delayed = []
+        self.handled = 0
+
+    def _next_item(self, stopping):
+        now = time.monotonic()
+        for n, (ready_at, item, requeued) in enumerate(self.delayed):
+            if ready_at <= now:
+                del self.delayed[n]
+                return item, requeued
+        if self.backlog:
+            return self.backlog.pop(0), 0
+        if stopping:
+            time.sleep(1)
+            return None, 0
+        try:
+            return self.inbox.get(timeout=1), 0
+        except queue.Empty:
+            return None, 0
+
+    def run(self):
+        stopping = False
+        while not (stopping and not self.delayed and not self.backlog):
+            if self.deadline and self.deadline.expired():
+                print(f"[{self.name}] Time budget used up, leaving the rest for the next run")
+                break
+            item, requeued = self._next_item(stopping)
+            if item is None:
+                continue
+            if item is STOP:
+                stopping = True
+                continue
+
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                print(f"[{self.name}] Error handling {item}: {e}")
+                continue
+
+            if result is REQUEUE:
+                if requeued < MAX_REQUEUES:
+                    self.delayed.append((time.monotonic() + REQUEUE_DELAY, item, requeued + 1))
+                else:
+                    print(f"[{self.name}] Giving up on {item} after {requeued} retries")
+                continue
+
+            self.handled += 1
+            if result is not None and self.outbox is not None:
+                self._put(result)
+
+        if self.outbox is not None:
+            self._put(STOP)
+
+    def _put(self, item):
+        # the next stage may already have stopped at the deadline; its work is in the ledgers for the next run
+        while True:
+            try:
+                self.outbox.put(item, timeout=1)
+                return
+            except queue.Full:
+                if self.deadline and self.deadline.expired():
+                    return
+
+
+def submit_handler(pool):
+    def handle(item):
+        qid, question = item
+        print(f"[submit] {question[:50]}...")
+        with pool.session() as bot:
+            url = bot.ask_question(question)
+            # a submission cut off by its deadline, an outage or a dead browser is tried again later
+            return REQUEUE if bot.last_aborted or bot.last_error in (CIRCUIT_OPEN, BROWSER_FAILED) else url
+    return handle
+
+
+def harvest_handler(reports):
+    def handle(url):
+        print(f"[harvest] {url}")
+        if reports.get_report(url, timeout=HARVEST_POLL) in (ANSWER_RUNNING, ANSWER_ABORTED):
+            return REQUEUE
+        if reports.last_error in (CIRCUIT_OPEN, BROWSER_FAILED):
+            return REQUEUE
+        return reports.last_report_file
+    return handle
+
+
+def validate_handler(validator):
+    def handle(report_file):
+        report_file = Path(report_file)
+        print(f"[validate] {report_file.name}")
+        with open(report_file, "r", encoding="utf-8") as f:
+            content = f.read()
+        url = validator.ask_question(report_file.name, content)
+        return REQUEUE if validator.last_aborted or validator.last_error in (CIRCUIT_OPEN, BROWSER_FAILED) else url
+    return handle
+
+
+def validation_harvest_handler(reports):
+    def handle(url):
+        print(f"[validation harvest] {url}")
+        if reports.get_report(url, timeout=HARVEST_POLL) in (ANSWER_RUNNING, ANSWER_ABORTED):
+            return REQUEUE
+        if reports.last_error in (CIRCUIT_OPEN, BROWSER_FAILED):
+            return REQUEUE
+        return None
+    return handle
+
+
+def pending_questions(limit=None):
+    """Unprocessed (qid, question) pairs in corpus order, all of them when `limit` is None"""
+    processed = load_processed_questions()
+    pending = []
+    for record in load_records():
+        if record["qid"] in processed:
+            continue
+        processed.add(record["qid"])
+        pending.append((record["qid"], record["question"]))
+        if limit is not None and len(pending) >= limit:
+            break
+    return pending
+
+
+def pending_work():
+    """
+    Stage steps still ahead of every waiting item: four per unsubmitted question, three per
+    unharvested answer, two per unvalidated report and one per unharvested validation answer.
+
+    Any item moving on through the pipeline lowers it, so it measures progress across runs.
+    """
+    validated = run_validator.load_processed_reports()
+    unvalidated = [path for path in run_validator.get_audits_reports() if path.name not in validated]
+    return (4 * len(pending_questions()) + 3 * len(run_report.get_pending_urls()) + 2 * len(unvalidated)
+            + len(run_validator_report.get_pending_urls()))
+
+
+def run_pipeline(limit=25, extract="page", deadline=None):
+    """
+    Push questions through submit -> harvest -> validate -> validation harvest.
+
+    Every stage also starts with whatever earlier runs left pending for it, so one run drains
+    the whole backlog as well as the new questions. `limit=None` submits every pending question;
+    with a Deadline every stage stops once it has passed.
+    """
+    if not preflight(BASE_URL):
+        return
+
+    questions_in = queue.Queue()
+    urls = queue.Queue(maxsize=QUEUE_SIZE)
+    reports = queue.Queue(maxsize=QUEUE_SIZE)
+    validation_urls = queue.Queue(maxsize=QUEUE_SIZE)
+
+    validated = run_validator.load_processed_reports()
+    report_backlog = [path for path in run_validator.get_audits_reports() if path.name not in validated]
+
+    for item in pending_questions(limit):
+        questions_in.put(item)
+    questions_in.put(STOP)
+
+    with DeepwikiPool(size=1) as pool:
+        harvester = GetReports(teardown=True, extract=extract)
+        validator = Validator(teardown=True)
+        validation_harvester = GetValidatedReports(teardown=True, extract=extract)
+
+        stages = [
+            Stage("submit", submit_handler(pool), questions_in, urls, deadline=deadline),
+            Stage("harvest", harvest_handler(harvester), urls, reports,
+                  backlog=run_report.get_pending_urls(), deadline=deadline),
+            Stage("validate", validate_handler(validator), reports, validation_urls,
+                  backlog=report_backlog, deadline=deadline),
+            Stage("validation harvest", validation_harvest_handler(validation_harvester), validation_urls,
+                  backlog=run_validator_report.get_pending_urls(), deadline=deadline),
+        ]
+        try:
+            for stage in stages:
+                stage.start()
+            for stage in stages:
+                stage.join()
+        finally:
+            harvester.status.close()
+            validation_harvester.status.close()
+            for bot in (harvester, validator, validation_harvester):
+                close_driver(bot.driver)
+
+    print("\n=== Pipeline summary ===")
+    for stage in stages:
+        print(f"{stage.name}: {stage.handled} handled, {len(stage.delayed)} still waiting")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run submission, harvest and validation as one streaming pipeline")
+    parser.add_argument("--limit", type=int, default=25, help="maximum new questions to submit")
+    parser.add_argument("--extract", choices=EXTRACT_MODES, default="page",
+                        help="how answer text is read back (clipboard needs a display)")
+    args = parser.parse_args()
+
+    try:
+        run_pipeline(limit=args.limit, extract=args.extract)
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == '__main__':
+    main()
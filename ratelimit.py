@@ -0,0 +1,74 @@
+import threading
+import time
+
+# rates are requests per second; submissions start at one every 20s and may climb to one every 2s
+SUBMIT_RATE = 0.05
+SUBMIT_MAX_RATE = 0.5
+# harvests only load finished pages, so they start faster
+HARVEST_RATE = 0.2
+HARVEST_MAX_RATE = 2.0
+MIN_RATE = 0.01
+# additive increase per success, as a share of the starting rate
+INCREASE_STEP = 0.2
+# multiplicative decrease on a failure, and the milder one on a slow success
+DECREASE_FACTOR = 0.5
+SLOW_FACTOR = 0.8
+BURST = 2
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every worker of a process, with AIMD on the refill rate.
+
+    Each success adds `step` to the rate up to `max_rate`; a failure halves it and empties the
+    bucket, and a success slower than `slow` seconds trims it by SLOW_FACTOR, so the rate
+    settles just under what the site keeps answering.
+    """
+
+    def __init__(self, name, rate, max_rate, slow, min_rate=MIN_RATE, burst=BURST):
+        self.name = name
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.step = rate * INCREASE_STEP
+        self.slow = slow
+        self.burst = burst
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until the bucket has a token for one request"""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(min(wait, 1))
+
+    def success(self, latency=None):
+        with self._lock:
+            self._refill(time.monotonic())
+            if latency is not None and latency > self.slow:
+                self.rate = max(self.min_rate, self.rate * SLOW_FACTOR)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.step)
+
+    def failure(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+            self.tokens = 0.0
+            print(f"{self.name} rate lowered to {self.rate * 60:.1f}/min")
+
+
+# a submission is slow once its result page takes longer than this to appear
+submissions = RateLimiter("Submission", SUBMIT_RATE, SUBMIT_MAX_RATE, slow=45)
+# a harvest is slow once loading the answer page takes longer than this
+harvests = RateLimiter("Harvest", HARVEST_RATE, HARVEST_MAX_RATE, slow=20)
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the queue then only coordinates threads of one process
+    fcntl = None
+
+# failed items of one runner script; each runner keeps its own file so runners that commit their
+# state from separate jobs (forward and reversed audits run at the same time) never edit the same one
+RETRY_FILE_PATTERN = "retries_{}.json"
+RUNNERS = ("audit", "audit_reversed", "validator", "report", "validator_report")
+# attempts after which an item stops being retried and moves to the dead letters
+MAX_ATTEMPTS = 4
+# the wait before attempt n + 1 is BACKOFF_BASE * 2 ** (n - 1) seconds, at most BACKOFF_MAX
+BACKOFF_BASE = 30
+BACKOFF_MAX = 600
+
+_thread_lock = threading.Lock()
+
+
+def retry_file(runner):
+    """audit -> retries_audit.json"""
+    return RETRY_FILE_PATTERN.format(runner)
+
+
+class RetryQueue:
+    """
+    Failed work items of one `kind` (questions, reports, ...) with their error class and attempt count.
+
+    A failure schedules the item again after an exponential backoff; once it has failed
+    `max_attempts` times it moves to the dead letters, which are skipped until revived
+    with `python retry_queue.py revive`. The file survives the run, so attempts add up across runs.
+    """
+
+    def __init__(self, path, kind="question", max_attempts=MAX_ATTEMPTS, base=BACKOFF_BASE,
+                 cap=BACKOFF_MAX):
+        self.path = path
+        self.kind = kind
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        # items handed out by take() in this process that have not failed or succeeded again yet
+        self._taken = set()
+
+    @contextmanager
+    def _locked(self):
+        with _thread_lock, open(f"{self.path}.lock", "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._read()
+                yield data
+                self._write(data)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault("pending", {})
+        data.setdefault("dead", {})
+        return data
+
+    def _write(self, data):
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def _key(self, key):
+        return f"{self.kind}:{key}"
+
+    def backoff(self, attempts):
+        return min(self.cap, self.base * 2 ** (attempts - 1))
+
+    def fail(self, key, error):
+        """Record a failed attempt; returns True if the item will be retried, False if it was dead-lettered"""
+        with self._locked() as data:
+            self._taken.discard(key)
+            item = data["pending"].pop(self._key(key), None) or {"attempts": 0}
+            item["attempts"] += 1
+            item["error"] = error
+            item["failed_at"] = time.time()
+            if item["attempts"] >= self.max_attempts:
+                item.pop("next_at", None)
+                data["dead"][self._key(key)] = item
+                return False
+            item["next_at"] = item["failed_at"] + self.backoff(item["attempts"])
+            data["pending"][self._key(key)] = item
+            return True
+
+    def succeed(self, key):
+        """Forget an item once it went through"""
+        self._taken.discard(key)
+        if not self._tracked(key):
+            return
+        with self._locked() as data:
+            data["pending"].pop(self._key(key), None)
+            data["dead"].pop(self._key(key), None)
+
+    def is_dead(self, key):
+        return self._key(key) in self._read()["dead"]
+
+    def take(self, keys):
+        """Return the due item among `keys` that has waited longest and hand it out once, or None"""
+        now = time.time()
+        with _thread_lock:
+            pending = self._read()["pending"]
+            due = [(pending[self._key(key)]["next_at"], key) for key in keys
+                   if key not in self._taken and self._key(key) in pending]
+            due = [(next_at, key) for next_at, key in due if next_at <= now]
+            if not due:
+                return None
+            key = min(due)[1]
+            self._taken.add(key)
+            return key
+
+    def wait_time(self, keys):
+        """Seconds until the next of `keys` that is not handed out yet comes due, None when none is pending"""
+        with _thread_lock:
+            pending = self._read()["pending"]
+            times = [pending[self._key(key)]["next_at"] for key in keys
+                     if key not in self._taken and self._key(key) in pending]
+        if not times:
+            return None
+        return max(0.0, min(times) - time.time())
+
+    def wait_until_due(self, key):
+        """Sleep out the backoff of one pending item"""
+        item = self._read()["pending"].get(self._key(key))
+        if item:
+            time.sleep(max(0.0, item["next_at"] - time.time()))
+
+    def pending_items(self):
+        return self._items("pending")
+
+    def dead_letters(self):
+        return self._items("dead")
+
+    def _items(self, section):
+        prefix = f"{self.kind}:"
+        return {key[len(prefix):]: item for key, item in self._read()[section].items() if key.startswith(prefix)}
+
+    def revive(self):
+        """Move this kind's dead letters back to pending with a clean attempt count; returns how many"""
+        prefix = f"{self.kind}:"
+        with self._locked() as data:
+            keys = [key for key in data["dead"] if key.startswith(prefix)]
+            for key in keys:
+                item = data["dead"].pop(key)
+                data["pending"][key] = {"attempts": 0, "error": item.get("error"), "next_at": 0}
+        return len(keys)
+
+    def _tracked(self, key):
+        data = self._read()
+        return self._key(key) in data["pending"] or self._key(key) in data["dead"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or revive failed work items")
+    parser.add_argument("command", choices=("show", "revive"))
+    parser.add_argument("--kind", default="question", help="question, validation, report or validated_report")
+    parser.add_argument("--runner", choices=RUNNERS, default="audit", help="runner script whose retry file to use")
+    parser.add_argument("--file", default=None, help="retry file to use instead of the runner's")
+    args = parser.parse_args()
+
+    retries = RetryQueue(args.file or retry_file(args.runner), args.kind)
+    if args.command == "show":
+        pending = retries.pending_items()
+        print(f"Pending retries: {len(pending)}")
+        for key, item in pending.items():
+            print(f"  {key}: {item['attempts']} attempts, last error {item.get('error')}")
+        dead = retries.dead_letters()
+        print(f"Dead letters: {len(dead)}")
+        for key, item in dead.items():
+            print(f"  {key}: {item['attempts']} attempts, last error {item.get('error')}")
+    else:
+        print(f"Revived {retries.revive()} dead {args.kind} items")
+
+
+if __name__ == '__main__':
+    main()
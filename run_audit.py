@@ -1,58 +1,415 @@
-import json
-import os
-from audit import Deepwiki
-from questions import questions
+import argparse
+import queue
+import threading
+import time
+from contextlib import nullcontext
+
+import ledger
+from audit import BASE_URL, INLINE_HARVEST_TIMEOUT
+from browser import BROWSER_FAILED, BROWSER_FAILURE_LIMIT, BROWSER_GONE
+from budget import BatchBudget
+from session_pool import DeepwikiPool
+from sqlite_ledger import get_db
+from corpus import entry_question_id, load_records, remaining_count
+from deadlines import QUESTION_TIMEOUT
+from dedup import DEFAULT_THRESHOLD, near_duplicate_groups
+from health import CIRCUIT_OPEN, preflight
+from leases import LEASES_FILE, LeaseStore, parse_share, share_of
+from multitab import TabMultiplexer
+from retry_queue import RetryQueue, retry_file
+
+# other runners' submissions reach this one's ledgers with every checkpoint pull, so they are re-read this often
+LEDGER_REFRESH = 300
 
 
 def load_processed_questions():
-    """Load processed questions from both collections and reversed_collections JSON files"""
+    """Load the ids of processed questions from both collections and reversed_collections JSON files"""
+    db = get_db()
+    if db:
+        return db.processed_question_ids()
+
     processed = set()
 
     for filename in ["collections.json", "reversed_collections.json"]:
-        if not os.path.exists(filename):
-            continue
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-                processed.update(item.get("question", "") for item in data)
+            processed.update(entry_question_id(item) for item in ledger.load_entries(filename))
         except Exception as e:
             print(f"Error loading {filename}: {e}")
 
     return processed
 
-try:
+
+def get_remaining_count(runner="audit"):
+    """Unprocessed corpus questions that `runner` would still submit, i.e. not dead-lettered in its retry file"""
+    try:
+        dead = RetryQueue(retry_file(runner), "question").dead_letters()
+        return remaining_count(load_processed_questions() | set(dead))
+    except Exception as e:
+        print(f"Error getting remaining count: {e}")
+        return 0
+
+
+def run_batch(records, is_reversed=False, workers=1, limit=25, near_duplicates="off", similarity=DEFAULT_THRESHOLD,
+              leases=None, inline_harvest=False, tabs=1, question_timeout=QUESTION_TIMEOUT, retries=None,
+              budget=None, checkpoint_every=ledger.CHECKPOINT_EVERY, checkpoint_cmd=None, share=None):
+    """
+    Submit up to `limit` unprocessed questions (no cap when None) using `workers` concurrent browsers.
+
+    Every worker owns one pooled driver with its own profile directory and pulls
+    from a shared queue, so a question is only ever submitted by one worker.
+
+    With near_duplicates="skip" only the first question of each near-duplicate group
+    (at `similarity` Jaccard) is submitted; "defer" queues the rest after everything else.
+
+    With a LeaseStore every question is claimed before it is submitted, so several runners
+    (forward, reversed or more) sharing the lease file never submit the same question.
+
+    Runners on separate machines split the corpus with `share` = (index, count) instead: the
+    questions whose id falls in this runner's share go first, everyone else's are queued after
+    them. By the time a runner gets there the ledger refresh skips what the others submitted,
+    so the runners only overlap where their shares run dry.
+
+    With inline_harvest the answer is captured in the submitting tab, skipping the later
+    run_report.py visit for every answer that finishes in time.
+
+    With tabs > 1 each worker keeps that many questions in flight in separate tabs of its one
+    browser instead of waiting for every result page in turn.
+
+    Every submission gets `question_timeout` seconds before its browser is aborted.
+
+    Only successful submissions count against `limit`. With a RetryQueue a failed question is
+    recorded with its error class and tried again in this run once its backoff has passed;
+    after too many failures it becomes a dead letter and later batches skip it.
+
+    The batch does not start when a probe of BASE_URL fails, and it stops early once the
+    shared circuit breaker stays open for longer than a caller is willing to wait. A browser
+    that cannot start or dies puts its question back without charging an attempt; after
+    BROWSER_FAILURE_LIMIT such failures in a row the batch stops.
+
+    With `budget` seconds of wall-clock time, new questions are only started while the average
+    time per question so far predicts they finish inside it.
+
+    The ledgers are written out every `checkpoint_every` seconds, each time followed by
+    `checkpoint_cmd` (e.g. a git commit, pull and push). The ledgers are re-read every
+    LEDGER_REFRESH seconds, and a question another runner submitted in the meantime is skipped.
+    """
+    if tabs > 1 and inline_harvest:
+        print("Inline harvest is not available with several tabs per worker, ignoring it")
+
+    if not preflight(BASE_URL):
+        return
+
     processed = load_processed_questions()
-    total = len(questions)
-    skipped = 0
-    processed_count = 0
+    # what the ledgers held at the last refresh, including what other runners submitted since the start
+    submitted = {"ids": set(processed), "at": time.monotonic()}
+    total = len(records)
 
     print(f"Total questions: {total}")
     print(f"Already processed: {len(processed)}")
 
-    counter = 0
-    for i, question in enumerate(questions):
+    groups = near_duplicate_groups(records, similarity) if near_duplicates != "off" else {}
+    covered_groups = {tuple(group) for group in groups.values() if processed.intersection(group)}
+
+    pending = queue.Queue()
+    deferred = []
+    # questions of other runners' shares, only taken once this runner's own share is done
+    others = []
+    skipped = 0
+    for i, record in enumerate(records):
+        question = record["question"]
         # Skip if already processed
-        if question in processed:
+        if record["qid"] in processed:
             skipped += 1
             print(f"[{i + 1}/{total}] Skipping (already processed): {question[:50]}...")
             continue
+        if retries and retries.is_dead(record["qid"]):
+            skipped += 1
+            print(f"[{i + 1}/{total}] Skipping (failed too often, see retry_queue.py): {question[:50]}...")
+            continue
+        # identical questions later in the corpus collapse onto this one
+        processed.add(record["qid"])
+
+        group = tuple(groups.get(record["qid"], ()))
+        if group in covered_groups:
+            if near_duplicates == "skip":
+                skipped += 1
+                print(f"[{i + 1}/{total}] Skipping (near duplicate): {question[:50]}...")
+            else:
+                deferred.append((i, record["qid"], question))
+            continue
+        if len(group) > 1:
+            covered_groups.add(group)
+
+        if share and share_of(record["qid"], share[1]) != share[0]:
+            others.append((i, record["qid"], question))
+            continue
+        pending.put((i, record["qid"], question))
+
+    for item in deferred + others:
+        pending.put(item)
+
+    # "halted" holds the reason once the batch has to stop early
+    stats = {"processed": 0, "claimed_elsewhere": 0, "failed": 0, "dead": 0, "browser_failures": 0,
+             "halted": None}
+    # questions that failed in this run and may come back once their backoff has passed
+    failed = {}
+    stats_lock = threading.Lock()
+    # the first question is assumed to take as long as it is allowed to
+    estimate = question_timeout + (INLINE_HARVEST_TIMEOUT if inline_harvest and tabs == 1 else 0)
+    batch_budget = BatchBudget(budget, initial_estimate=estimate)
+
+    def batch_over():
+        # called with stats_lock held
+        return ((limit is not None and stats["processed"] >= limit) or stats["halted"]
+                or not batch_budget.can_start())
+
+    def claim_slot():
+        # the batch cap is shared by all workers
+        with stats_lock:
+            if batch_over():
+                return False
+            stats["processed"] += 1
+            return True
+
+    def next_retry():
+        """Wait for a failed question of this batch to come due, None when none is left or the batch is full"""
+        while retries:
+            with stats_lock:
+                if batch_over():
+                    return None
+            qid = retries.take(list(failed))
+            if qid:
+                return failed.pop(qid)
+            wait = retries.wait_time(list(failed))
+            if wait is None:
+                return None
+            time.sleep(min(wait, 5))
+        return None
+
+    def submitted_elsewhere(qid):
+        with stats_lock:
+            if time.monotonic() - submitted["at"] >= LEDGER_REFRESH:
+                submitted["ids"] = load_processed_questions()
+                submitted["at"] = time.monotonic()
+            return qid in submitted["ids"]
+
+    def next_item(worker_id):
+        """Take the next question this runner may submit, or None when the batch is over"""
+        while True:
+            try:
+                i, qid, question = pending.get_nowait()
+            except queue.Empty:
+                item = next_retry()
+                if item is None:
+                    return None
+                i, qid, question = item
+            if submitted_elsewhere(qid):
+                with stats_lock:
+                    stats["claimed_elsewhere"] += 1
+                print(f"[worker {worker_id}] [{i + 1}/{total}] Skipping (submitted by another runner): {question[:50]}...")
+                continue
+            if leases and not leases.claim([qid]):
+                with stats_lock:
+                    stats["claimed_elsewhere"] += 1
+                print(f"[worker {worker_id}] [{i + 1}/{total}] Skipping (claimed by another runner): {question[:50]}...")
+                continue
+            if not claim_slot():
+                if leases:
+                    leases.release([qid])
+                return None
 
-        print(f"[{i + 1}/{total}] Processing: {question[:50]}...")
-        bot = Deepwiki(teardown=True)
-        bot.ask_question(question, is_reversed=False)
-        processed_count += 1
+            print(f"[worker {worker_id}] [{i + 1}/{total}] Processing: {question[:50]}...")
+            return i, qid, question
 
-        counter += 1
-        if counter >= 25:
-            break
+    def browser_failed(worker_id):
+        with stats_lock:
+            stats["browser_failures"] += 1
+            if stats["browser_failures"] >= BROWSER_FAILURE_LIMIT and not stats["halted"]:
+                stats["halted"] = "the browser kept failing"
+                print(f"[worker {worker_id}] The browser failed {stats['browser_failures']} times in a row, "
+                      f"stopping this batch")
+            return bool(stats["halted"])
+
+    def finish(worker_id, item, url, error=None):
+        i, qid, question = item
+        if url:
+            with stats_lock:
+                stats["browser_failures"] = 0
+            if leases:
+                leases.complete([qid])
+            if retries:
+                retries.succeed(qid)
+            return
+
+        error = error or "UnknownError"
+        if error == BROWSER_GONE:
+            # its tab's browser went away; tab_worker counts that once for the whole browser
+            with stats_lock:
+                stats["processed"] -= 1
+                halted = stats["halted"]
+            if leases:
+                leases.release([qid])
+            if not halted:
+                pending.put(item)
+            return
+        print(f"[worker {worker_id}] Failed to submit question {i + 1} ({error})")
+        # only real progress counts against the batch cap
+        with stats_lock:
+            stats["processed"] -= 1
+            stats["failed"] += 1
+        # a failed question goes back to the shared pool for any runner to retry
+        if leases:
+            leases.release([qid])
+        if error == CIRCUIT_OPEN:
+            # the site is down, not the question; stop instead of burning its attempts
+            with stats_lock:
+                stats["halted"] = "Deepwiki kept failing"
+            return
+        if error == BROWSER_FAILED:
+            # our own browser is at fault, not the question; put it back for the next healthy one
+            if not browser_failed(worker_id):
+                pending.put(item)
+            return
+        if not retries:
+            return
+        if retries.fail(qid, error):
+            failed[qid] = item
+        else:
+            with stats_lock:
+                stats["dead"] += 1
+            print(f"[worker {worker_id}] Giving up on question {i + 1} after {retries.max_attempts} failed attempts")
+
+    def worker(worker_id, pool):
+        while True:
+            item = next_item(worker_id)
+            if item is None:
+                return
+            i, qid, question = item
+
+            url = None
+            error = None
+            done = batch_budget.timer()
+            try:
+                # with an inline harvest one question can outlast the lease TTL, so its claim is kept fresh
+                with pool.session() as bot, (leases.held([qid]) if leases else nullcontext()):
+                    url = bot.ask_question(question, is_reversed=is_reversed, harvest=inline_harvest,
+                                           timeout=question_timeout)
+                    error = bot.last_error
+            except Exception as e:
+                # the pool could not start a browser for this question
+                error = BROWSER_FAILED
+                print(f"[worker {worker_id}] Error processing question {i + 1}: {e}")
+            finally:
+                done()
+                finish(worker_id, item, url, error)
+
+    def tab_worker(worker_id, pool):
+        # one browser per worker, `tabs` questions in flight inside it
+        def on_result(question, item, url, error):
+            finish(worker_id, item, url, error)
+
+        while True:
+            bot = None
+            try:
+                with pool.session() as bot, TabMultiplexer(bot, tabs, is_reversed, on_result,
+                                                           question_timeout=question_timeout) as mux:
+                    while bot.is_alive():
+                        item = next_item(worker_id)
+                        if item is None:
+                            return
+                        # with several tabs in flight the time between submissions is the time per question
+                        done = batch_budget.timer()
+                        mux.submit(item[2], key=item)
+                        mux.poll()
+                        done()
+            except Exception as e:
+                print(f"[worker {worker_id}] Error in multi-tab worker: {e}")
+            # the browser died, could not start or was aborted by a deadline; the pool replaces it on the
+            # next session. Every browser that was not aborted counts once towards BROWSER_FAILURE_LIMIT
+            if (bot is None or not bot.driver.aborted) and browser_failed(worker_id):
+                return
+
+    checkpointer = ledger.Checkpointer(checkpoint_every, checkpoint_cmd)
+    checkpointer.start()
+
+    workers = max(1, workers)
+    with DeepwikiPool(size=workers) as pool:
+        target = tab_worker if tabs > 1 else worker
+        threads = [threading.Thread(target=target, args=(n + 1, pool), daemon=True) for n in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
     print(f"\n=== Summary ===")
     print(f"Skipped: {skipped}")
-    print(f"Newly processed: {processed_count}")
+    print(f"Claimed by other runners: {stats['claimed_elsewhere']}")
+    print(f"Failed submissions: {stats['failed']}")
+    print(f"Given up after repeated failures: {stats['dead']}")
+    if stats["halted"]:
+        print(f"Stopped early: {stats['halted']}")
+    print(f"Newly processed: {stats['processed']}")
+    if batch_budget.items:
+        print(f"Average time per question: {batch_budget.estimate:.0f}s")
     print(f"Total: {total}")
+    checkpointer.stop()
+
+
+def parse_args(runner="audit"):
+    parser = argparse.ArgumentParser(description="Submit audit questions to Deepwiki")
+    parser.add_argument("--workers", type=int, default=1, help="number of concurrent browser workers")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="maximum questions to submit in this batch (default 25, or no cap with --budget)")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="seconds of wall-clock time the batch may use; questions are started while they fit")
+    parser.add_argument("--near-duplicates", choices=("off", "skip", "defer"), default="off",
+                        help="skip or deprioritise questions that closely match one already covered")
+    parser.add_argument("--similarity", type=float, default=DEFAULT_THRESHOLD,
+                        help="word-set Jaccard similarity at which questions count as near duplicates")
+    parser.add_argument("--inline-harvest", action="store_true",
+                        help="wait for each answer in the submitting tab and save the report directly")
+    parser.add_argument("--tabs", type=int, default=1,
+                        help="questions each worker keeps in flight in separate tabs of one browser")
+    parser.add_argument("--question-timeout", type=int, default=QUESTION_TIMEOUT,
+                        help="seconds one submission may take before its browser is aborted and it is retried")
+    parser.add_argument("--retries", default=retry_file(runner),
+                        help="file recording failed questions for backoff retries; pass an empty string to disable")
+    parser.add_argument("--checkpoint-every", type=int, default=ledger.CHECKPOINT_EVERY,
+                        help="seconds between checkpoints of the ledgers")
+    parser.add_argument("--checkpoint-cmd", default=None,
+                        help="shell command run after every checkpoint, e.g. to commit, pull and push the ledgers")
+    parser.add_argument("--share", type=parse_share, default=None,
+                        help="INDEX/COUNT: runners on separate machines each take their share of the corpus first")
+    parser.add_argument("--leases", default=LEASES_FILE,
+                        help="lease file shared by runners in this directory; pass an empty string to disable")
+    return parser.parse_args()
+
+
+def batch_options(args):
+    return {
+        "workers": args.workers,
+        "limit": args.limit if args.limit is not None else (None if args.budget else 25),
+        "budget": args.budget,
+        "near_duplicates": args.near_duplicates,
+        "similarity": args.similarity,
+        "leases": LeaseStore(args.leases) if args.leases else None,
+        "inline_harvest": args.inline_harvest,
+        "tabs": args.tabs,
+        "question_timeout": args.question_timeout,
+        "retries": RetryQueue(args.retries, "question") if args.retries else None,
+        "checkpoint_every": args.checkpoint_every,
+        "checkpoint_cmd": args.checkpoint_cmd,
+        "share": args.share,
+    }
 
-except Exception as e:
-    print(f"Error: {e}")
 
+def main():
+    args = parse_args()
+    try:
+        run_batch(load_records(), is_reversed=False, **batch_options(args))
+    except Exception as e:
+        print(f"Error: {e}")
 
 
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,48 @@
 
-import json
 import os
+import ledger
+from corpus import entry_question_id
 
 
 def merge_validated_into_collections():
     """
     Merges all data from reversed_collections.json into collections.json.
-    Avoids duplicates based on URL or question field.
+    Avoids duplicates based on URL or question id.
     """
     try:
         # Load collections.json
         collections_data = []
         if os.path.exists("collections.json"):
-            with open("collections.json", "r") as f:
-                collections_data = json.load(f)
+            collections_data = ledger.load_entries("collections.json")
 
         # Load reversed_collections.json
         if not os.path.exists("reversed_collections.json"):
             print("No reversed_collections.json found")
             return
 
-        with open("reversed_collections.json", "r") as f:
-            validated_data = json.load(f)
+        validated_data = ledger.load_entries("reversed_collections.json")
 
         # Create a set of existing identifiers to avoid duplicates
         existing_identifiers = set()
         for item in collections_data:
-            # Use URL or question as identifier
-            identifier = item.get("url") or item.get("question") or item.get("filename")
+            # Use URL or question id as identifier
+            identifier = item.get("url") or entry_question_id(item) or item.get("filename")
             if identifier:
                 existing_identifiers.add(identifier)
 
         # Merge validated data
         added_count = 0
         for item in validated_data:
-            identifier = item.get("url") or item.get("question") or item.get("filename")
+            identifier = item.get("url") or entry_question_id(item) or item.get("filename")
 
             if identifier and identifier not in existing_identifiers:
                 collections_data.append(item)
                 existing_identifiers.add(identifier)
                 added_count += 1
 
-        # Write back to collections.json
-        with open("collections.json", "w") as f:
-            json.dump(collections_data, f, indent=2)
+        # Write back to collections.json, folding its journal in first so nothing is written twice
+        ledger.compact("collections.json")
+        ledger.write_entries("collections.json", collections_data)
 
         print(f"Successfully merged {added_count} items from reversed_collections.json into collections.json")
         print(f"Total items in collections.json: {len(collections_data)}")
@@ -1,6 +1,6 @@
 import os
 import shutil
-import json
+import ledger
 
 
 def clean_up():
@@ -42,8 +42,7 @@ def clean_up():
         # Step 3: Empty the JSON files
         json_files = ["collections.json", "validated.json", "reversed_collections.json"]
         for json_file in json_files:
-            with open(json_file, "w") as f:
-                json.dump([], f, indent=2)
+            ledger.clear(json_file)
             print(f"Emptied {json_file}")
 
         print("\n=== Cleanup completed successfully ===")
@@ -1,6 +1,18 @@
-import json
+import argparse
 import os
-from audit import GetReports
+from collections import deque
+import ledger
+from audit import BASE_URL, GetReports
+from browser import (ANSWER_ABORTED, ANSWER_DONE, ANSWER_RUNNING, BROWSER_FAILED, BROWSER_FAILURE_LIMIT, EXTRACT_MODES,
+                     HARVEST_TIMEOUT)
+from health import CIRCUIT_OPEN, preflight
+from retry_queue import RetryQueue, retry_file
+from budget import BatchBudget
+from deadlines import HARVEST_MARGIN
+from sqlite_ledger import get_db
+
+# how many times an answer that is still generating, or whose harvest ran out of time, goes back to the end of the queue
+MAX_REQUEUES = 2
 
 
 def load_processed_reports():
@@ -19,12 +31,11 @@ def load_processed_reports():
     # Better approach: read from collections.json
     if os.path.exists("collections.json"):
         try:
-            with open("collections.json", "r") as f:
-                data = json.load(f)
-                # Get URLs that have reports generated
-                for item in data:
-                    if item.get("report_generated", False):
-                        processed_urls.add(item.get("url", ""))
+            data = ledger.load_entries("collections.json")
+            # Get URLs that have reports generated
+            for item in data:
+                if item.get("report_generated", False):
+                    processed_urls.add(item.get("url", ""))
         except Exception as e:
             print(f"Error loading collections: {e}")
 
@@ -37,9 +48,12 @@ def get_pending_urls():
         print("No collections.json found")
         return []
 
+    db = get_db()
+    if db:
+        return db.pending_urls("collections.json")
+
     try:
-        with open("collections.json", "r") as f:
-            data = json.load(f)
+        data = ledger.load_entries("collections.json")
 
         processed = load_processed_reports()
         pending = []
@@ -65,13 +79,20 @@ def get_remaining_count():
         if not os.path.exists("collections.json"):
             return 0
 
-        with open("collections.json", "r") as f:
-            data = json.load(f)
+        # URLs that failed too often are skipped by every batch, so they are not waiting for one
+        dead = RetryQueue(retry_file("report"), "report").dead_letters()
+
+        db = get_db()
+        if db:
+            return sum(1 for url in db.pending_urls("collections.json") if url not in dead)
+
+        data = ledger.load_entries("collections.json")
 
         processed = load_processed_reports()
 
         # Count URLs that don't have reports yet
-        remaining = sum(1 for item in data if item.get("url", "") and item.get("url", "") not in processed)
+        remaining = sum(1 for item in data
+                        if item.get("url", "") and item.get("url", "") not in processed and item["url"] not in dead)
 
         return remaining
 
@@ -80,24 +101,91 @@ def get_remaining_count():
         return 0
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Harvest Deepwiki answers into audits/")
+    parser.add_argument("--extract", choices=EXTRACT_MODES, default="page",
+                        help="how the answer text is read back (clipboard needs a display)")
+    parser.add_argument("--harvest-timeout", type=int, default=HARVEST_TIMEOUT,
+                        help="seconds to wait for one answer before moving on; the whole harvest is cut off shortly after")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="maximum answers to harvest (default 500, or no cap with --budget)")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="seconds of wall-clock time the run may use; answers are harvested while they fit")
+    return parser.parse_args()
+
+
+def harvest_urls(report, urls, retries, args):
+    """
+    Harvest `urls` with `report` (a GetReports or GetValidatedReports) and return how many answers were saved.
+
+    An answer that is still generating, or whose harvest ran out of time, goes back to the end of the queue
+    up to MAX_REQUEUES times. A harvest that failed outright is recorded in `retries` and comes back (marked -1)
+    once its backoff has passed. Up to `args.limit` answers are harvested while they fit in `args.budget`.
+    """
+    total = len(urls)
+    counter = 0
+    browser_failures = 0
+    work = deque((i, url, 0) for i, url in enumerate(urls) if not retries.is_dead(url))
+    limit = args.limit if args.limit is not None else (None if args.budget else 500)
+    # the first harvest is assumed to take as long as it is allowed to
+    batch_budget = BatchBudget(args.budget, initial_estimate=args.harvest_timeout + HARVEST_MARGIN)
+    while work and batch_budget.can_start():
+        i, url, requeued = work.popleft()
+        if requeued < 0:
+            # the backoff is slept out inside the budget; a retry that would not fit after it waits for the next run
+            if not batch_budget.can_start(retries.wait_time([url]) or 0):
+                print(f"[{i + 1}/{total}] Leaving {url[:50]} for the next run, its backoff would not fit the budget")
+                continue
+            retries.wait_until_due(url)
+        print(f"[{i + 1}/{total}] Generating report for: {url[:50]}...")
+        done = batch_budget.timer()
+        status = report.get_report(url, timeout=args.harvest_timeout)
+        done()
+        if status is None and report.last_error == BROWSER_FAILED:
+            # our browser is at fault, not the answer; try it again once the browser is restarted
+            browser_failures += 1
+            if browser_failures >= BROWSER_FAILURE_LIMIT:
+                print("The browser kept failing, stopping this batch")
+                break
+            work.append((i, url, requeued))
+            continue
+        browser_failures = 0
+        if status in (ANSWER_RUNNING, ANSWER_ABORTED) and requeued < MAX_REQUEUES:
+            # come back once the rest of the batch has had its turn
+            work.append((i, url, requeued + 1))
+        elif status == ANSWER_DONE:
+            retries.succeed(url)
+            # only harvested answers count against the limit
+            counter += 1
+            if limit is not None and counter >= limit:
+                break
+        elif status is None and report.last_error == CIRCUIT_OPEN:
+            print("Deepwiki kept failing, stopping this batch")
+            break
+        elif status is None and retries.fail(url, report.last_error or "UnknownError"):
+            work.append((i, url, -1))
+    return counter
+
+
 def main():
+    args = parse_args()
     try:
         pending_urls = get_pending_urls()
         total = len(pending_urls)
 
         if total == 0:
             print("No pending reports to generate")
+        elif not preflight(BASE_URL):
+            return
         else:
             print(f"Found {total} URLs needing reports")
 
-            counter = 0
-            report = GetReports(teardown=True)
-            for i, url in enumerate(pending_urls):
-                print(f"[{i + 1}/{total}] Generating report for: {url[:50]}...")
-                report.get_report(url)
-                counter += 1
-                if counter >= 500:
-                    break
+            report = GetReports(teardown=True, extract=args.extract)
+            retries = RetryQueue(retry_file("report"), "report")
+            harvest_urls(report, pending_urls, retries, args)
+
+            report.status.close()
+            ledger.checkpoint()
 
             print(f"\n=== Completed {total} reports ===")
 
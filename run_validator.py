@@ -1,7 +1,15 @@
-import json
+import argparse
 import os
+from collections import deque
 from pathlib import Path
-from audit_validation import Validator
+import ledger
+from audit_validation import BASE_URL, Validator
+from browser import BROWSER_FAILED, BROWSER_FAILURE_LIMIT, close_driver
+from health import CIRCUIT_OPEN, preflight
+from retry_queue import RetryQueue, retry_file
+from budget import BatchBudget
+from deadlines import QUESTION_TIMEOUT
+from sqlite_ledger import get_db
 
 
 def load_processed_reports():
@@ -9,11 +17,14 @@ def load_processed_reports():
     if not os.path.exists("validated.json"):
         return set()
 
+    db = get_db()
+    if db:
+        return db.validated_filenames()
+
     try:
-        with open("validated.json", "r") as f:
-            data = json.load(f)
-            # Return a set of processed filenames
-            return {item.get("filename", "") for item in data if "filename" in item}
+        data = ledger.load_entries("validated.json")
+        # Return a set of processed filenames
+        return {item.get("filename", "") for item in data if "filename" in item}
     except Exception as e:
         print(f"Error loading collections: {e}")
         return set()
@@ -40,8 +51,12 @@ def get_remaining_count():
         processed_files = load_processed_reports()
         processed_count = len(processed_files)
 
+        # files that failed too often are skipped by every batch, so they are not waiting for one
+        dead = set(RetryQueue(retry_file("validator"), "validation").dead_letters()) - processed_files
+        dead_count = len(dead.intersection(audit_file.name for audit_file in audit_files))
+
         # Calculate remaining
-        remaining_count = total_count - processed_count
+        remaining_count = total_count - processed_count - dead_count
 
         return remaining_count
 
@@ -50,7 +65,17 @@ def get_remaining_count():
         return 0
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Submit audit reports to Deepwiki for validation")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="maximum reports to submit (default 25, or no cap with --budget)")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="seconds of wall-clock time the run may use; reports are submitted while they fit")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     try:
         # Get all audit files
         audit_files = get_audits_reports()
@@ -63,12 +88,33 @@ def main():
         processed_count = 0
         skipped_count = 0
         counter = 0
-
-        for i, audit_file in enumerate(audit_files, 1):
+        browser_failures = 0
+
+        if not preflight(BASE_URL):
+            return
+
+        # failed files come back at the end of the queue once their backoff has passed
+        retries = RetryQueue(retry_file("validator"), "validation")
+        work = deque((i, audit_file, False) for i, audit_file in enumerate(audit_files, 1))
+        limit = args.limit if args.limit is not None else (None if args.budget else 25)
+        batch_budget = BatchBudget(args.budget, initial_estimate=QUESTION_TIMEOUT)
+        bot = None
+        while work and batch_budget.can_start():
+            i, audit_file, is_retry = work.popleft()
             if audit_file.name in processed_files:
                 print(f"[{i}/{total}] Skipping (already processed): {audit_file.name}")
                 skipped_count += 1
                 continue
+            if retries.is_dead(audit_file.name):
+                print(f"[{i}/{total}] Skipping (failed too often, see retry_queue.py): {audit_file.name}")
+                skipped_count += 1
+                continue
+            if is_retry:
+                # the backoff is slept out inside the budget; a retry that would not fit after it waits for the next run
+                if not batch_budget.can_start(retries.wait_time([audit_file.name]) or 0):
+                    print(f"[{i}/{total}] Leaving {audit_file.name} for the next run, its backoff would not fit the budget")
+                    continue
+                retries.wait_until_due(audit_file.name)
 
             print(f"\n[{i}/{total}] Processing: {audit_file.name}")
 
@@ -76,30 +122,64 @@ def main():
                 with open(audit_file, 'r', encoding='utf-8') as f:
                     content = f.read()
 
-                # Initialize the validator and process the content
-                bot = Validator(teardown=True)
-                print(f"Processing content from {audit_file.name}...")
-
-                # Assuming bot.ask_question() is what processes the content
-                # You might want to pass the filename as well
-                bot.ask_question(audit_file.name, content)
+                # started before the browser so its launch counts towards the first item
+                done = batch_budget.timer()
+                try:
+                    # one browser for the whole batch; ask_question replaces it once it is aborted or dead
+                    if bot is None:
+                        bot = Validator(teardown=True)
+                    print(f"Processing content from {audit_file.name}...")
+
+                    # Assuming bot.ask_question() is what processes the content
+                    # You might want to pass the filename as well
+                    url = bot.ask_question(audit_file.name, content)
+                    error = bot.last_error
+                except Exception as e:
+                    print(f"Could not start the browser: {e}")
+                    url, error = None, BROWSER_FAILED
+                done()
+                if not url and error == BROWSER_FAILED:
+                    # our browser is at fault, not the report; try it again with a fresh one
+                    browser_failures += 1
+                    if browser_failures >= BROWSER_FAILURE_LIMIT:
+                        print("The browser kept failing, stopping this batch")
+                        break
+                    work.append((i, audit_file, is_retry))
+                    continue
+                browser_failures = 0
+                if not url and error == CIRCUIT_OPEN:
+                    print("Deepwiki kept failing, stopping this batch")
+                    break
+                if not url:
+                    # a failure does not use up one of the batch's slots
+                    print(f"Failed to submit {audit_file.name} for validation ({error})")
+                    if retries.fail(audit_file.name, error or "UnknownError"):
+                        work.append((i, audit_file, True))
+                    continue
+                retries.succeed(audit_file.name)
 
                 # Add to processed files
                 processed_files.add(audit_file.name)
                 processed_count += 1
 
                 counter += 1
-                if counter >= 25:
+                if limit is not None and counter >= limit:
                     break
 
             except Exception as e:
                 print(f"Error processing {audit_file.name}: {str(e)}")
                 continue
 
+        if bot is not None:
+            close_driver(bot.driver)
+
         print(f"\n=== Summary ===")
         print(f"Total files: {total}")
         print(f"Processed: {processed_count}")
         print(f"Skipped: {skipped_count}")
+        if batch_budget.items:
+            print(f"Average time per report: {batch_budget.estimate:.0f}s")
+        ledger.checkpoint()
 
     except Exception as e:
         print(f"Error: {e}")
@@ -1,6 +1,12 @@
-import json
+import argparse
 import os
-from audit_validation import GetValidatedReports
+import ledger
+from audit_validation import BASE_URL, GetValidatedReports
+from browser import EXTRACT_MODES, HARVEST_TIMEOUT
+from health import preflight
+from retry_queue import RetryQueue, retry_file
+from run_report import harvest_urls
+from sqlite_ledger import get_db
 
 
 def load_processed_reports():
@@ -19,12 +25,11 @@ def load_processed_reports():
     # Better approach: read from collections.json
     if os.path.exists("validated.json"):
         try:
-            with open("validated.json", "r") as f:
-                data = json.load(f)
-                # Get URLs that have reports generated
-                for item in data:
-                    if item.get("report_generated", False):
-                        processed_urls.add(item.get("url", ""))
+            data = ledger.load_entries("validated.json")
+            # Get URLs that have reports generated
+            for item in data:
+                if item.get("report_generated", False):
+                    processed_urls.add(item.get("url", ""))
         except Exception as e:
             print(f"Error loading validation: {e}")
 
@@ -37,9 +42,12 @@ def get_pending_urls():
         print("No validated.json found")
         return []
 
+    db = get_db()
+    if db:
+        return db.pending_urls("validated.json")
+
     try:
-        with open("validated.json", "r") as f:
-            data = json.load(f)
+        data = ledger.load_entries("validated.json")
 
         processed = load_processed_reports()
         pending = []
@@ -55,22 +63,44 @@ def get_pending_urls():
         return []
 
 
-try:
-    pending_urls = get_pending_urls()
-    total = len(pending_urls)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Harvest Deepwiki validation answers into validated/")
+    parser.add_argument("--extract", choices=EXTRACT_MODES, default="page",
+                        help="how the answer text is read back (clipboard needs a display)")
+    parser.add_argument("--harvest-timeout", type=int, default=HARVEST_TIMEOUT,
+                        help="seconds to wait for one answer before moving on; the whole harvest is cut off shortly after")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="maximum answers to harvest (default 500, or no cap with --budget)")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="seconds of wall-clock time the run may use; answers are harvested while they fit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        pending_urls = get_pending_urls()
+        total = len(pending_urls)
 
+        if total == 0:
+            print("No pending reports to generate")
+        elif not preflight(BASE_URL):
+            return
+        else:
+            print(f"Found {total} URLs needing reports")
 
-    if total == 0:
-        print("No pending reports to generate")
-    else:
-        print(f"Found {total} URLs needing reports")
+            report = GetValidatedReports(teardown=True, extract=args.extract)
+            retries = RetryQueue(retry_file("validator_report"), "validated_report")
+            harvest_urls(report, pending_urls, retries, args)
 
-        report = GetValidatedReports(teardown=True)
-        for i, url in enumerate(pending_urls):
-            print(f"[{i+1}/{total}] Generating report for: {url[:50]}...")
-            report.get_report(url)
+            report.status.close()
+            ledger.checkpoint()
+
+            print(f"\n=== Completed {total} reports ===")
+
+    except Exception as e:
+        print(f"Error: {e}")
 
-        print(f"\n=== Completed {total} reports ===")
 
-except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
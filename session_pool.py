@@ -0,0 +1,106 @@
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from audit import Deepwiki
+from browser import close_driver
+
+
+class DeepwikiPool:
+    """Bounded pool of long-lived Deepwiki drivers that are handed out one question at a time"""
+
+    def __init__(self, size=1, factory=None):
+        self.size = max(1, size)
+        self.factory = factory or self._new_deepwiki
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def acquire(self):
+        """Return a healthy driver, starting a new one only while the pool is below its size"""
+        while True:
+            try:
+                bot = self._idle.get_nowait()
+            except queue.Empty:
+                bot = self._create_or_wait()
+
+            if bot.is_alive():
+                return bot
+
+            print("Browser session is no longer responding, replacing it")
+            self._discard(bot)
+
+    def release(self, bot):
+        """Hand a driver back to the pool, dropping it if it died while in use"""
+        if bot.is_alive():
+            self._idle.put(bot)
+        else:
+            print("Browser session died during use, it will be replaced")
+            self._discard(bot)
+
+    @contextmanager
+    def session(self):
+        bot = self.acquire()
+        try:
+            yield bot
+        finally:
+            self.release(bot)
+
+    def close(self):
+        """Quit every driver the pool started"""
+        with self._lock:
+            bots, self._all = self._all, []
+        for bot in bots:
+            self._quit(bot)
+
+    @staticmethod
+    def _new_deepwiki():
+        # every driver gets a throwaway profile so parallel Chrome instances never share one
+        return Deepwiki(teardown=True, profile_dir=tempfile.mkdtemp(prefix="deepwiki-profile-"))
+
+    def _create_or_wait(self):
+        with self._lock:
+            can_create = len(self._all) < self.size
+            if can_create:
+                # reserve the slot before the slow Chrome start
+                self._all.append(None)
+
+        if not can_create:
+            return self._idle.get()
+
+        try:
+            bot = self.factory()
+        except Exception:
+            with self._lock:
+                self._all.remove(None)
+            raise
+
+        with self._lock:
+            self._all[self._all.index(None)] = bot
+        return bot
+
+    def _discard(self, bot):
+        with self._lock:
+            if bot in self._all:
+                self._all.remove(bot)
+        self._quit(bot)
+
+    @staticmethod
+    def _quit(bot):
+        if bot is None:
+            return
+        try:
+            close_driver(bot.driver)
+        except Exception:
+            pass
+        profile_dir = getattr(bot, "profile_dir", None)
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+import ledger
+from corpus import entry_question_id
+
+# the SQLite ledger is opt-in: set SKK_LEDGER_DB to a database path to mirror and query the JSON ledgers through it
+LEDGER_DB_ENV = "SKK_LEDGER_DB"
+LEDGER_FILES = ("collections.json", "reversed_collections.json", "validated.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ledger TEXT NOT NULL,
+    question_id TEXT,
+    question TEXT,
+    filename TEXT,
+    url TEXT,
+    timestamp TEXT,
+    report_generated INTEGER NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entries_question_id ON entries (question_id);
+CREATE INDEX IF NOT EXISTS idx_entries_url ON entries (url);
+CREATE INDEX IF NOT EXISTS idx_entries_filename ON entries (filename);
+CREATE INDEX IF NOT EXISTS idx_entries_status ON entries (ledger, report_generated);
+CREATE TABLE IF NOT EXISTS sources (
+    ledger TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+"""
+
+# columns with a home in the table; anything else in a record is kept in `extra`
+COLUMNS = ("question_id", "question", "filename", "url", "timestamp", "report_generated")
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """Return the shared SqliteLedger when SKK_LEDGER_DB is set, otherwise None"""
+    global _db
+
+    path = os.environ.get(LEDGER_DB_ENV)
+    if not path:
+        return None
+
+    with _db_lock:
+        if _db is None or _db.path != path:
+            _db = SqliteLedger(path)
+        return _db
+
+
+def file_signature(path):
+    """Size and modification time of a ledger's array file and journal; every write to them changes it"""
+    parts = []
+    for name in (path, ledger.journal_path(path)):
+        try:
+            stat = os.stat(name)
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append("-")
+    return "/".join(parts)
+
+
+class SqliteLedger:
+    """
+    Indexed copy of collections.json, reversed_collections.json and validated.json.
+
+    Every ledger is stamped with the signature of its JSON files whenever the two agree. Queries
+    first re-import a ledger whose files changed behind the database's back (never imported, or
+    written by a process without SKK_LEDGER_DB), so they never answer from a stale copy.
+    """
+
+    def __init__(self, path="ledger.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self.conn:
+            return self.conn.execute(sql, params).fetchall()
+
+    def record(self, ledger_name, entry):
+        """Add one ledger record"""
+        with self._lock, self.conn:
+            self._insert(ledger_name, entry)
+
+    def _insert(self, ledger_name, entry):
+        extra = {k: v for k, v in entry.items() if k not in COLUMNS}
+        self.conn.execute(
+            "INSERT INTO entries (ledger, question_id, question, filename, url, timestamp, report_generated, extra)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                ledger_name,
+                entry_question_id(entry),
+                entry.get("question"),
+                entry.get("filename"),
+                entry.get("url"),
+                entry.get("timestamp"),
+                1 if entry.get("report_generated") else 0,
+                json.dumps(extra, ensure_ascii=False) if extra else None,
+            )
+        )
+
+    def is_synced(self, ledger_name):
+        rows = self._execute("SELECT signature FROM sources WHERE ledger = ?", (ledger_name,))
+        return bool(rows) and rows[0]["signature"] == file_signature(ledger_name)
+
+    def stamp(self, ledger_name):
+        """Record that the rows of this ledger match its JSON files as they are now"""
+        self._execute("INSERT OR REPLACE INTO sources (ledger, signature) VALUES (?, ?)",
+                      (ledger_name, file_signature(ledger_name)))
+
+    def sync(self, ledger_name):
+        """Re-import one ledger unless its rows still match its JSON files"""
+        with ledger.locked(ledger_name):
+            if not self.is_synced(ledger_name):
+                self.import_json(ledger_name)
+
+    def clear(self, ledger_name):
+        self._execute("DELETE FROM entries WHERE ledger = ?", (ledger_name,))
+
+    def mark_report_generated(self, ledger_name, url):
+        """Flip the harvest status of the first record with this URL"""
+        self._execute(
+            "UPDATE entries SET report_generated = 1 WHERE id = "
+            "(SELECT id FROM entries WHERE ledger = ? AND url = ? ORDER BY id LIMIT 1)",
+            (ledger_name, url)
+        )
+
+    def processed_question_ids(self, ledger_names=("collections.json", "reversed_collections.json")):
+        for ledger_name in ledger_names:
+            self.sync(ledger_name)
+        placeholders = ", ".join("?" for _ in ledger_names)
+        rows = self._execute(
+            f"SELECT DISTINCT question_id FROM entries WHERE ledger IN ({placeholders}) AND question_id IS NOT NULL",
+            tuple(ledger_names)
+        )
+        return {row["question_id"] for row in rows}
+
+    def pending_urls(self, ledger_name):
+        """URLs whose report has not been harvested, in submission order"""
+        self.sync(ledger_name)
+        rows = self._execute(
+            "SELECT url FROM entries WHERE ledger = ? AND report_generated = 0 AND url IS NOT NULL AND url != ''"
+            " AND url NOT IN (SELECT url FROM entries WHERE ledger = ? AND report_generated = 1 AND url IS NOT NULL)"
+            " ORDER BY id",
+            (ledger_name, ledger_name)
+        )
+        return [row["url"] for row in rows]
+
+    def remaining_count(self, ledger_name):
+        return len(self.pending_urls(ledger_name))
+
+    def validated_filenames(self):
+        self.sync("validated.json")
+        rows = self._execute("SELECT DISTINCT filename FROM entries WHERE ledger = 'validated.json' AND filename IS NOT NULL")
+        return {row["filename"] for row in rows}
+
+    def import_json(self, path, ledger_name=None):
+        """Replace the rows of one ledger with the contents of its JSON file (and journal)"""
+        ledger_name = ledger_name or os.path.basename(path)
+        with ledger.locked(path):
+            data = ledger.load_entries(path)
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM entries WHERE ledger = ?", (ledger_name,))
+                for entry in data:
+                    self._insert(ledger_name, entry)
+            if ledger_name == path:
+                self.stamp(ledger_name)
+        return len(data)
+
+    def export_json(self, path, ledger_name=None):
+        """Write one ledger back out in the JSON array format the scripts read"""
+        ledger_name = ledger_name or os.path.basename(path)
+        rows = self._execute("SELECT * FROM entries WHERE ledger = ? ORDER BY id", (ledger_name,))
+        data = []
+        for row in rows:
+            entry = {}
+            for key in ("question_id", "question", "filename", "url", "timestamp"):
+                if row[key] is not None:
+                    entry[key] = row[key]
+            entry["report_generated"] = bool(row["report_generated"])
+            if row["extra"]:
+                entry.update(json.loads(row["extra"]))
+            data.append(entry)
+
+        with ledger.locked(path):
+            ledger.compact(path)
+            ledger.write_entries(path, data)
+            if ledger_name == path:
+                self.stamp(ledger_name)
+        return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or export the JSON ledgers to/from SQLite")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("--db", default=os.environ.get(LEDGER_DB_ENV, "ledger.db"))
+    parser.add_argument("files", nargs="*", default=list(LEDGER_FILES))
+    args = parser.parse_args()
+
+    db = SqliteLedger(args.db)
+    for path in args.files:
+        if args.command == "import":
+            if not os.path.exists(path):
+                print(f"Skipping {path}, it does not exist")
+                continue
+            print(f"Imported {db.import_json(path)} records from {path}")
+        else:
+            print(f"Exported {db.export_json(path)} records to {path}")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+
+import pytest
+
+import ledger
+
+APPENDS = 300
+
+
+def _append_many(path, writer):
+    ledger.COMPACT_EVERY = 10
+    for i in range(APPENDS):
+        ledger.append_entry(path, {"writer": writer, "i": i})
+    ledger.compact(path)
+
+
+@pytest.mark.skipif(ledger.fcntl is None, reason="needs fcntl to lock across processes")
+def test_concurrent_processes_keep_every_record(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SKK_LEDGER_DB", raising=False)
+    path = "collections.json"
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_many, args=(path, writer)) for writer in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [worker.exitcode for worker in workers] == [0, 0]
+    records = ledger.load_entries(path)
+    assert len(records) == 2 * APPENDS
+    assert {(r["writer"], r["i"]) for r in records} == {(w, i) for w in range(2) for i in range(APPENDS)}
+    assert not os.path.exists(ledger.journal_path(path))